@@ -0,0 +1,287 @@
+"""Offline trajectory analytics over mission archives.
+
+Archives are read one at a time, so a scan keeps only fixed-size reservoirs
+and one compact row per mission in memory. It reads the archives written at
+mission end (dumps/archives/<mission>.json) and older checkpoint_T*.json files.
+"""
+
+import csv
+import json
+import os
+import random
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+RESERVOIR_SIZE = 4096
+PERCENTILES = (50, 90, 95, 99)
+OUTLIER_Z = 3.5  # modified z-score (median/MAD) above which a mission is flagged
+OUTLIER_FIELDS = ("turns", "duration_s", "error_rate")
+CSV_FIELDS = ("mission_id", "task", "outcome", "turns", "duration_s", "actions", "errors", "error_rate",
+              "loop_turns", "reconfigurations", "path", "outlier")
+
+# ============================================================================
+# STREAMING PRIMITIVES
+# ============================================================================
+
+class Reservoir:
+    """Uniform fixed-size sample of a stream (Algorithm R) for approximate percentiles."""
+    def __init__(self, size: int = RESERVOIR_SIZE, seed: int = 0):
+        self.size = size
+        self.seen = 0
+        self.total = 0.0
+        self.items: List[float] = []
+        self.rng = random.Random(seed)
+    
+    def add(self, value: float) -> None:
+        self.seen += 1
+        self.total += value
+        if len(self.items) < self.size:
+            self.items.append(value)
+        else:
+            slot = self.rng.randrange(self.seen)
+            if slot < self.size:
+                self.items[slot] = value
+    
+    def summary(self, digits: int = 3) -> Dict[str, Any]:
+        if not self.seen:
+            return {"count": 0}
+        ordered = sorted(self.items)
+        out = {"count": self.seen, "mean": round(self.total / self.seen, digits)}
+        for p in PERCENTILES:
+            out[f"p{p}"] = round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], digits)
+        out["max_sampled"] = round(ordered[-1], digits)
+        return out
+
+def iter_archive_paths(paths: Iterable[str]) -> Iterator[str]:
+    """Yield .json files under each path (directories are walked lazily; missing paths are reported and skipped)."""
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        if not os.path.isdir(path):
+            print(f"⚠️ No archives found at {path}")
+            continue
+        stack = [path]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        stack.append(entry.path)
+                    elif entry.name.endswith(".json"):
+                        yield entry.path
+
+def outcome_of(status: str) -> str:
+    if status.startswith("Completed"):
+        return "completed"
+    if status.startswith("Max iterations"):
+        return "max_steps"
+    if status.startswith("Deadline"):
+        return "deadline"
+    return status.lower() or "unknown"
+
+def load_archive(path: str) -> Optional[Dict[str, Any]]:
+    """Read one archive and normalize legacy checkpoints; None if it is not an archive."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    if "actions" in data:
+        return data
+    if "full_archive" in data:
+        # Checkpoint written on Ctrl+C before mission archives existed
+        return {
+            "mission_id": os.path.splitext(os.path.basename(path))[0],
+            "task": data.get("task", ""),
+            "status": "Aborted",
+            "turns": data.get("turn", 0),
+            "final_phase": data.get("phase", ""),
+            "actions": data.get("full_archive") or [],
+        }
+    return None
+
+# ============================================================================
+# AGGREGATION
+# ============================================================================
+
+def modified_z(values: List[float]) -> List[float]:
+    """Robust z-scores: 0.6745 * (x - median) / MAD (0 when MAD is 0)."""
+    if not values:
+        return []
+    ordered = sorted(values)
+    median = ordered[len(ordered) // 2]
+    deviations = sorted(abs(v - median) for v in values)
+    mad = deviations[len(deviations) // 2]
+    if mad == 0:
+        return [0.0] * len(values)
+    return [0.6745 * (v - median) / mad for v in values]
+
+class TrajectoryStats:
+    """Running aggregates over mission archives."""
+    def __init__(self, reservoir_size: int = RESERVOIR_SIZE):
+        self.reservoir_size = reservoir_size
+        self.missions = 0
+        self.skipped = 0
+        self.outcomes: Dict[str, int] = {}
+        self.turns_to_completion = Reservoir(reservoir_size)
+        self.tools: Dict[str, List[int]] = {}  # tool -> [calls, errors]
+        self.loop_missions = 0
+        self.loop_turns = 0
+        self.loop_known = 0
+        self.reconfigurations = Reservoir(reservoir_size)
+        self.phase_turns: Dict[str, Reservoir] = {}
+        self.phase_seconds: Dict[str, Reservoir] = {}
+        self.stage_ms: Dict[str, Reservoir] = {}
+        self.action_ms: Dict[str, Reservoir] = {}
+        self.first_call_ms: Dict[str, Reservoir] = {}  # "persona/warm|cold|unknown"
+        self.request_failures: Dict[str, int] = {}  # reason -> failed inference requests
+        self.rows: List[Dict[str, Any]] = []
+    
+    def reservoir(self, table: Dict[str, Reservoir], key: str) -> Reservoir:
+        if key not in table:
+            table[key] = Reservoir(self.reservoir_size, seed=len(table))
+        return table[key]
+    
+    def add(self, archive: Dict[str, Any], path: str = "") -> None:
+        self.missions += 1
+        status = archive.get("status", "")
+        outcome = archive.get("outcome") or outcome_of(status)
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        turns = int(archive.get("turns", 0))
+        if outcome == "completed":
+            self.turns_to_completion.add(turns)
+        
+        actions = archive.get("actions") or []
+        errors = 0
+        for action in actions:
+            tool = action.get("tool", "?")
+            failed = str(action.get("result", "")).startswith("Error:")
+            errors += failed
+            counts = self.tools.setdefault(tool, [0, 0])
+            counts[0] += 1
+            counts[1] += failed
+            if action.get("latency"):
+                self.reservoir(self.action_ms, tool).add(action["latency"] * 1000)
+        
+        loop_turns = archive.get("loop_turns")
+        if loop_turns is not None:
+            self.loop_known += 1
+            self.loop_turns += loop_turns
+            self.loop_missions += loop_turns > 0
+        if "reconfigurations" in archive:
+            self.reconfigurations.add(archive["reconfigurations"])
+        
+        # Phase spans: each entry lasts until the next one (the last until the mission ends)
+        phase_log = archive.get("phase_log") or []
+        ended = archive.get("ended")
+        for i, (turn, phase, at) in enumerate(phase_log):
+            next_turn, _, next_at = phase_log[i + 1] if i + 1 < len(phase_log) else (turns + 1, None, ended)
+            self.reservoir(self.phase_turns, phase).add(next_turn - turn)
+            if next_at is not None:
+                self.reservoir(self.phase_seconds, phase).add(next_at - at)
+        
+        for stage, samples in (archive.get("stage_ms") or {}).items():
+            res = self.reservoir(self.stage_ms, stage)
+            for ms in samples:
+                res.add(ms)
+        
+        # Whether a warmup had completed before that persona's first call; archives written before it was recorded count as unknown
+        warmed = archive.get("first_call_warmed") or {}
+        for persona, seconds in (archive.get("first_call_s") or {}).items():
+            warmup = "unknown" if persona not in warmed else "warm" if warmed[persona] else "cold"
+            self.reservoir(self.first_call_ms, f"{persona}/{warmup}").add(seconds * 1000)
+        
+        for reason, count in (archive.get("request_failures") or {}).items():
+            self.request_failures[reason] = self.request_failures.get(reason, 0) + count
+        
+        started = archive.get("started")
+        self.rows.append({
+            "mission_id": archive.get("mission_id", ""),
+            "task": archive.get("task", "")[:200],
+            "outcome": outcome,
+            "turns": turns,
+            "duration_s": round(ended - started, 3) if started and ended else None,
+            "actions": len(actions),
+            "errors": errors,
+            "error_rate": round(errors / len(actions), 4) if actions else 0.0,
+            "loop_turns": loop_turns,
+            "reconfigurations": archive.get("reconfigurations"),
+            "path": path,
+            "outlier": "",
+        })
+    
+    def flag_outliers(self) -> List[Dict[str, Any]]:
+        """Mark rows whose turns, duration or error rate is far from the fleet median."""
+        for field in OUTLIER_FIELDS:
+            rows = [row for row in self.rows if row[field] is not None]
+            for row, z in zip(rows, modified_z([float(row[field]) for row in rows])):
+                if abs(z) > OUTLIER_Z:
+                    row["outlier"] = (row["outlier"] + " " if row["outlier"] else "") + f"{field}(z={z:.1f})"
+        return [row for row in self.rows if row["outlier"]]
+    
+    def report(self) -> Dict[str, Any]:
+        outliers = self.flag_outliers()
+        return {
+            "missions": self.missions,
+            "skipped_files": self.skipped,
+            "outcomes": self.outcomes,
+            "completion_rate": round(self.outcomes.get("completed", 0) / self.missions, 4) if self.missions else 0.0,
+            "turns_to_completion": self.turns_to_completion.summary(1),
+            "tools": {
+                tool: {"calls": calls, "errors": errs, "success_rate": round(1 - errs / calls, 4)}
+                for tool, (calls, errs) in sorted(self.tools.items(), key=lambda item: -item[1][0])
+            },
+            "loops": {
+                "missions_with_data": self.loop_known,
+                "missions_with_loops": self.loop_missions,
+                "loop_mission_rate": round(self.loop_missions / self.loop_known, 4) if self.loop_known else None,
+                "loop_turns_per_mission": round(self.loop_turns / self.loop_known, 3) if self.loop_known else None,
+            },
+            "tactician_reconfigurations": self.reconfigurations.summary(1),
+            "phase_turns": {phase: res.summary(1) for phase, res in self.phase_turns.items()},
+            "phase_seconds": {phase: res.summary(1) for phase, res in self.phase_seconds.items()},
+            "stage_latency_ms": {stage: res.summary(1) for stage, res in self.stage_ms.items()},
+            "action_latency_ms": {tool: res.summary(1) for tool, res in self.action_ms.items()},
+            "first_call_ms": {key: res.summary(1) for key, res in sorted(self.first_call_ms.items())},
+            "request_failures": dict(sorted(self.request_failures.items(), key=lambda item: -item[1])),
+            "outliers": [{k: row[k] for k in ("mission_id", "task", "outcome", "turns", "duration_s", "error_rate", "outlier", "path")}
+                         for row in outliers],
+        }
+
+def analyze(paths: Iterable[str], reservoir_size: int = RESERVOIR_SIZE, progress_every: int = 1000) -> TrajectoryStats:
+    stats = TrajectoryStats(reservoir_size)
+    for path in iter_archive_paths(paths):
+        archive = load_archive(path)
+        if archive is None:
+            stats.skipped += 1
+            continue
+        stats.add(archive, path)
+        if progress_every and stats.missions % progress_every == 0:
+            print(f"  … {stats.missions} archives", flush=True)
+    return stats
+
+def write_csv(rows: List[Dict[str, Any]], path: str) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def print_summary(report: Dict[str, Any]) -> None:
+    print(f"Missions: {report['missions']} (skipped {report['skipped_files']} files)  outcomes: {report['outcomes']}")
+    ttc = report["turns_to_completion"]
+    if ttc["count"]:
+        print(f"Turns to completion: mean {ttc['mean']}  p50 {ttc['p50']}  p95 {ttc['p95']}")
+    for tool, row in list(report["tools"].items())[:10]:
+        print(f"  {tool:<20} {row['calls']:>7} calls  {row['success_rate'] * 100:5.1f}% ok")
+    for stage, row in report["stage_latency_ms"].items():
+        print(f"  {stage:<12} p50 {row['p50']:>8.1f}ms  p95 {row['p95']:>8.1f}ms  p99 {row['p99']:>8.1f}ms")
+    for key, row in report["first_call_ms"].items():
+        print(f"  first call {key:<24} p50 {row['p50']:>8.1f}ms  ({row['count']} missions)")
+    if report["loops"]["missions_with_data"]:
+        print(f"Loops: {report['loops']['missions_with_loops']}/{report['loops']['missions_with_data']} missions")
+    if report["request_failures"]:
+        print(f"Request failures: {report['request_failures']}")
+    print(f"Outliers: {len(report['outliers'])}")
+    for row in report["outliers"][:10]:
+        print(f"  ⚠️ {row['mission_id']}: {row['outlier']}")
@@ -1,15 +1,27 @@
 import base64
-import ctypes
+import hashlib
 import json
+import math
 import os
 import re
 import struct
 import sys
+import threading
 import time
-import urllib.request
 import zlib
-from ctypes import wintypes
-from typing import Any, Dict, List, Tuple, Optional
+from array import array
+from collections import OrderedDict, deque
+from functools import lru_cache
+from itertools import accumulate
+from operator import add, mul
+from typing import Any, Deque, Dict, List, Tuple, Optional
+
+from winapi import (
+    INPUT, INPUT_I, INPUT_KEYBOARD, INPUT_MOUSE, KEYBDINPUT, KEYEVENTF_KEYUP, KEYEVENTF_UNICODE,
+    MOUSEEVENTF_LEFTDOWN, MOUSEEVENTF_LEFTUP, MOUSEEVENTF_RIGHTDOWN, MOUSEEVENTF_RIGHTUP,
+    MOUSEEVENTF_WHEEL, MOUSEINPUT, VK_MAP, capture_frame, get_cursor_pos, get_foreground_app,
+    init_dpi, move_mouse, send_input,
+)
 
 # ============================================================================
 # CONFIGURATION
@@ -19,18 +31,67 @@ from typing import Any, Dict, List, Tuple, Optional
 LMSTUDIO_ENDPOINT = "http://localhost:1234/v1/chat/completions"
 LMSTUDIO_MODEL = "qwen3-vl-4b-instruct"
 LMSTUDIO_TIMEOUT = 240
+LMSTUDIO_POOL_SIZE = 4  # Idle keep-alive connections kept for reuse by any thread
 LMSTUDIO_TEMPERATURE = 0.5
 
 LMSTUDIO_MAX_TOKENS = 1024
 
+# Request policy: transient failures retry with jittered exponential backoff, timeouts follow
+# each persona's observed latency, and MISSION_TIME_BUDGET caps a mission's wall time
+REQUEST_RETRIES = 2  # Extra attempts when the server cannot have started the request (send failures, HTTP 408/429/503)
+REQUEST_BACKOFF_BASE = 1.0  # Retry k sleeps between half and all of base * 2**k seconds
+REQUEST_BACKOFF_MAX = 16.0
+REQUEST_TIMEOUT_FACTOR = 3.0  # Timeout = factor × persona p95 latency, within [REQUEST_TIMEOUT_MIN, LMSTUDIO_TIMEOUT]
+REQUEST_TIMEOUT_MIN = 20.0
+REQUEST_TIMEOUT_SAMPLES = 5  # Calls observed before a persona's timeout leaves LMSTUDIO_TIMEOUT
+REQUEST_LATENCY_WINDOW = 50
+MISSION_TIME_BUDGET = 1800.0  # Seconds per mission; 0 = no deadline
+DEADLINE_TOKEN_HORIZON = 300.0  # With less time left, max_tokens shrinks in proportion
+DEADLINE_MIN_TOKENS = 128
+
+# Batch missions (python main.py batch queue.jsonl)
+BATCH_RESULTS_PATH = os.path.join("dumps", "batch_results.jsonl")
+DOCTRINE_CACHE_PATH = os.path.join("dumps", "doctrine_cache.json")
+
+# Self-consistency executor sampling
+EXECUTOR_SAMPLES = 1  # >1 requests N candidates and executes the majority action
+EXECUTOR_SAMPLING_USE_N = False  # True: one request with n=N (server must support it); False: N concurrent requests
+EXECUTOR_VOTE_RADIUS = 40.0  # Normalized (0-1000) distance within which click candidates agree
+EXECUTOR_VOTE_IGNORED_ARGS = ("justification", "evidence")  # Free-text reasoning that never matches across samples
+EXECUTOR_VOTE_CASELESS_ARGS = ("key", "label")  # Compared case-insensitively when voting
+
 AGENT_IMAGE_W = 512
 AGENT_IMAGE_H = 256
 
+# Vision payload encoding per persona: "rgb" (24-bit), "gray" (8-bit), "gray4" (4-bit), "palette" (8-bit 3-3-2 palette)
+IMAGE_MODES = {"strategist": "rgb", "tactician": "rgb", "executor": "rgb"}
+IMAGE_MODE_PHASES: Dict[Tuple[str, str], str] = {}  # (persona, phase prefix) → mode, e.g. ("executor", "EXECUTION"): "palette"
+
+# PNG deflate: images above PNG_PARALLEL_MIN bytes are compressed in scanline blocks on a thread pool
+PNG_COMPRESS_LEVEL = 6
+PNG_DEFLATE_THREADS = 0  # 0 = os.cpu_count(); 1 disables parallel deflate
+PNG_DEFLATE_BLOCK = 128 * 1024  # Uncompressed bytes per block (whole scanlines)
+PNG_PARALLEL_MIN = 512 * 1024
+
 DUMP_DIR = "dumps"
 DUMP_PREFIX = "screen_"
 
+# Content-addressed frame store (dumps/frames/<ab>/<sha256>.png + per-mission manifests)
+ENABLE_FRAME_STORE = True  # False writes one legacy screen_NNNN.png per turn
+FRAME_STORE_DIR = os.path.join(DUMP_DIR, "frames")
+MANIFEST_DIR = os.path.join(DUMP_DIR, "missions")
+ENABLE_MISSION_ARCHIVE = True  # one JSON summary per mission for `python main.py analyze`
+ARCHIVE_DIR = os.path.join(DUMP_DIR, "archives")
+ANALYTICS_RESERVOIR = 4096  # samples kept per percentile estimate
+FRAME_DELTA_ENCODING = False  # Store frames as zlib(XOR previous frame) when smaller than the PNG
+FRAME_DELTA_MAX_CHAIN = 8  # Deltas before forcing a full keyframe
+
 MAX_STEPS = 30
 
+# Prompt-cache warming: prefill persona prefixes (max_tokens=1) during idle sleeps
+PROMPT_WARMUP = True
+WARMUP_MIN_IDLE = 1.0  # Shortest sleep (s) worth warming in
+
 # TIMING CONSTANTS
 STARTUP_DELAY = 5.0
 TIMING_CURSOR_SETTLE = 0.12
@@ -43,232 +104,430 @@ TIMING_SCREENSHOT_SETTLE = 3.4
 TIMING_TURN_DELAY = 3.5
 TIMING_INTER_ACTION = 0.3
 
+# Adaptive timing: per-app/per-tool time-to-stable-frame; the TIMING_* constants are cold-start defaults
+ADAPTIVE_TIMING = True
+TIMING_PROFILE_PATH = os.path.join(DUMP_DIR, "timing_profiles.json")
+TIMING_PROBE_W, TIMING_PROBE_H = 256, 144  # Capture size for stability polling
+TIMING_POLL_INTERVAL = 0.1
+TIMING_STABLE_POLLS = 2  # Consecutive unchanged polls that count as settled
+TIMING_STABLE_CHANGE = 0.02  # Fraction of signature blocks allowed to flicker while settled
+TIMING_MIN_SAMPLES = 5  # Samples before the learned p95 replaces TIMING_UI_RENDER
+TIMING_MAX_RENDER = 8.0  # Give up waiting for a stable frame after this long
+TIMING_EWMA_ALPHA = 0.2
+TIMING_MIN_WAIT = {  # Per-tool floor under the learned p95 (menus/animations may start after the first poll)
+    "click_element": 0.3,
+    "double_click_element": 0.4,
+    "right_click_element": 0.4,
+    "drag_element": 0.3,
+    "type_text": 0.2,
+    "press_key": 0.3,
+    "scroll_down": 0.2,
+    "scroll_up": 0.2,
+}
+TIMING_MIN_WAIT_DEFAULT = 0.3
+TIMING_WINDOW = 50  # Recent samples kept per (app, tool) for the p95
+
+# Live metrics (Prometheus text format)
+METRICS_PORT = 0  # >0 serves http://127.0.0.1:PORT/metrics from a daemon thread
+METRICS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0, 160.0)
+
+# Import-time budget (python main.py bench-import); these stay unloaded until first use
+IMPORT_TIME_BUDGET_MS = 150
+DEFERRED_IMPORTS = ("argparse", "asyncio", "concurrent.futures", "http.client", "http.server", "sqlite3", "urllib.request")
+
 # FEATURE FLAGS
 ENABLE_ACTIVE_LOOP_PREVENTION = True
 ENABLE_FULL_ARCHIVE = True
+ENABLE_TARGET_CACHE = True  # Snap click coordinates to previously seen targets
+ENABLE_STATE_GRAPH = True  # Persist screen-state transitions across missions and hint known routes
+ENABLE_COMPACT_TOOLS = True  # Send executor tools with shortened, de-duplicated descriptions
+ENABLE_CONTACT_SHEET = True  # Show the tactician a tiled sheet of recent frames alongside the current one
+ENABLE_CHANGE_REGIONS = True  # Report where the screen changed after each action in the history
 
 # NEW: Three-body hierarchy config
-TACTICIAN_INTERVAL = 5  # Oversight every N turns
+TACTICIAN_MAX_STALENESS = 8  # Force oversight after N turns without a check
+TACTICIAN_COOLDOWN = 2  # Min turns between event-triggered oversight calls
+TACTICIAN_VISUAL_CHANGE = 0.35  # Fraction of changed frame blocks suggesting a phase boundary
+TACTICIAN_ERROR_STREAK = 2  # Consecutive "Error:" results before oversight
+CONCURRENT_OVERSIGHT_TRIGGERS = ("staleness",)  # Healthy triggers where executor runs alongside tactician on its previous config
 JUSTIFICATION_MIN_CHARS = 30
 LOOP_DETECTION_THRESHOLD = 3
 MAX_HISTORY_ITEMS = 10
 
+# Click target cache (pixels at AGENT_IMAGE_W x AGENT_IMAGE_H)
+TARGET_PATCH_SIZE = 24  # Square grayscale patch stored around each successful click
+TARGET_SEARCH_RADIUS = 24  # Search window around the executor's predicted point
+TARGET_MATCH_THRESHOLD = 0.85  # Min normalized cross-correlation to snap
+TARGET_SNAP_NEAR = 4  # Px from the predicted point within which a match snaps even if others also match
+TARGET_MIN_VARIANCE = 64.0  # Per-pixel variance below which a patch is too flat to match
+TARGET_CACHE_CAPACITY = 256  # LRU-bounded (app, label) entries
+
+# Screen-state graph memory
+GRAPH_DB_PATH = os.path.join(DUMP_DIR, "state_graph.sqlite3")
+GRAPH_HASH_DISTANCE = 3  # Max Hamming distance for two frames to be the same node (≤ bands - 1)
+GRAPH_ROUTE_MAX_DEPTH = 8
+GRAPH_AUTOPILOT = False  # Execute confident known-route steps without executor inference
+GRAPH_AUTOPILOT_MIN_SUCCESS = 3
+GRAPH_AUTOPILOT_MIN_RATE = 0.8
+
+# Context budget (prompt text around the screenshot)
+CONTEXT_TOKEN_BUDGET = 600
+CONTEXT_CHARS_PER_TOKEN = 4  # Rough estimate for English prompt text
+CONTEXT_DOCTRINE_TOKENS = 220  # Max share for doctrine (stable prefix)
+CONTEXT_SUMMARY_TOKENS = 80  # Max share for rolling summary of pruned turns
+CONTEXT_MIN_RECENT = 2  # Recent actions always reserved in budget
+CONTEXT_ACTION_TOKENS = 30  # Estimated cost per rendered action line
+
+# Doctrine sections (keys of parse_doctrine) each persona receives
+DOCTRINE_SECTIONS_TACTICIAN = ("recon", "options", "verification", "risks", "directives")
+DOCTRINE_SECTIONS_EXECUTOR = ("mission", "risks")
+DOCTRINE_PHASE_SECTIONS = {"RECON": "recon", "VERIF": "verification"}  # Phase prefix → extra executor section
+
+# Tactician contact sheet: the last N frames tiled into one AGENT_IMAGE_W-wide image
+CONTACT_SHEET_FRAMES = 4
+CONTACT_SHEET_COLS = 2  # Tiles per row; each frame is subsampled by this factor
+CONTACT_SHEET_MARKER = 5  # Crosshair arm length (tile pixels) at each action point
+
+# Changed regions between the pre- and post-action frames (block grid at AGENT_IMAGE_W x AGENT_IMAGE_H)
+CHANGE_BLOCK = 16  # Block size in pixels
+CHANGE_MAX_REGIONS = 3  # Largest regions reported per action
+CHANGE_FULL_FRACTION = 0.6  # Above this share of changed blocks the whole screen is reported as changed
+CHANGE_OVERLAY = False  # Also outline the regions on the screenshot sent to the models
+CHANGE_CURSOR_SIZE = 48  # Screen pixels around the cursor hotspot ignored (captures include the cursor)
+
+# Frame signature (coarse luminance grid for change detection)
+FRAME_SIG_COLS = 16
+FRAME_SIG_ROWS = 8
+FRAME_SIG_SAMPLES = 4  # Scanlines sampled per block row
+FRAME_SIG_TOLERANCE = 12  # Per-block luminance delta counted as changed
+
 # ============================================================================
-# WINDOWS API (unchanged)
+# METRICS
 # ============================================================================
 
-for attr in ["HCURSOR", "HICON", "HBITMAP", "HGDIOBJ", "HBRUSH", "HDC"]:
-    if not hasattr(wintypes, attr):
-        setattr(wintypes, attr, wintypes.HANDLE)
-if not hasattr(wintypes, "ULONG_PTR"):
-    wintypes.ULONG_PTR = ctypes.c_size_t
-
-user32 = ctypes.WinDLL("user32", use_last_error=True)
-gdi32 = ctypes.WinDLL("gdi32", use_last_error=True)
-
-DPI_AWARENESS_CONTEXT_PER_MONITOR_AWARE_V2 = ctypes.c_void_p(-4)
-SM_CXSCREEN, SM_CYSCREEN = 0, 1
-CURSOR_SHOWING, DI_NORMAL = 0x00000001, 0x0003
-BI_RGB, DIB_RGB_COLORS = 0, 0
-HALFTONE, SRCCOPY = 4, 0x00CC0020
-INPUT_MOUSE, INPUT_KEYBOARD = 0, 1
-KEYEVENTF_KEYUP, KEYEVENTF_UNICODE = 0x0002, 0x0004
-MOUSEEVENTF_LEFTDOWN, MOUSEEVENTF_LEFTUP = 0x0002, 0x0004
-MOUSEEVENTF_RIGHTDOWN, MOUSEEVENTF_RIGHTUP = 0x0008, 0x0010
-MOUSEEVENTF_WHEEL = 0x0800
-
-VK_MAP = {
-    "enter": 0x0D, "tab": 0x09, "escape": 0x1B, "esc": 0x1B, "windows": 0x5B, "win": 0x5B,
-    "ctrl": 0x11, "alt": 0x12, "shift": 0x10, "f4": 0x73, "c": 0x43, "v": 0x56,
-    "t": 0x54, "w": 0x57, "f": 0x46, "l": 0x4C, "r": 0x52,
-    "backspace": 0x08, "delete": 0x2E, "space": 0x20,
-    "home": 0x24, "end": 0x23, "pageup": 0x21, "pagedown": 0x22,
-    "left": 0x25, "up": 0x26, "right": 0x27, "down": 0x28,
+METRIC_HELP = {
+    "agent_turn_seconds": ("histogram", "Wall time per agent turn (excluding post-action settle)"),
+    "agent_inference_seconds": ("histogram", "Inference latency per persona"),
+    "agent_action_seconds": ("histogram", "Desktop action latency per tool"),
+    "agent_stage_seconds": ("histogram", "Turn pipeline stage latency"),
+    "agent_turns_total": ("counter", "Turns started"),
+    "agent_errors_total": ("counter", "Errors by kind (api, tool, parse)"),
+    "agent_loops_total": ("counter", "Turns on which a terminal loop was detected"),
+    "agent_fallbacks_total": ("counter", "Executor fallback configurations applied"),
+    "agent_tokens_total": ("counter", "Tokens reported by the server per persona and kind"),
+    "agent_phase": ("gauge", "1 for the current executor phase"),
+    "agent_turn": ("gauge", "Current turn number"),
+    "agent_queue_depth": ("gauge", "Items waiting per queue"),
+    "agent_warmup_seconds": ("histogram", "Prompt-cache warming request latency per persona"),
+    "agent_request_retries_total": ("counter", "Inference requests retried per persona and reason"),
+    "agent_request_failures_total": ("counter", "Inference requests failed after retries per persona and reason"),
 }
 
-class POINT(ctypes.Structure):
-    _fields_ = [("x", wintypes.LONG), ("y", wintypes.LONG)]
-
-class CURSORINFO(ctypes.Structure):
-    _fields_ = [("cbSize", wintypes.DWORD), ("flags", wintypes.DWORD),
-                ("hCursor", wintypes.HCURSOR), ("ptScreenPos", POINT)]
-
-class ICONINFO(ctypes.Structure):
-    _fields_ = [("fIcon", wintypes.BOOL), ("xHotspot", wintypes.DWORD),
-                ("yHotspot", wintypes.DWORD), ("hbmMask", wintypes.HBITMAP),
-                ("hbmColor", wintypes.HBITMAP)]
-
-class BITMAPINFOHEADER(ctypes.Structure):
-    _fields_ = [("biSize", wintypes.DWORD), ("biWidth", wintypes.LONG),
-                ("biHeight", wintypes.LONG), ("biPlanes", wintypes.WORD),
-                ("biBitCount", wintypes.WORD), ("biCompression", wintypes.DWORD),
-                ("biSizeImage", wintypes.DWORD), ("biXPelsPerMeter", wintypes.LONG),
-                ("biYPelsPerMeter", wintypes.LONG), ("biClrUsed", wintypes.DWORD),
-                ("biClrImportant", wintypes.DWORD)]
-
-class BITMAPINFO(ctypes.Structure):
-    _fields_ = [("bmiHeader", BITMAPINFOHEADER), ("bmiColors", wintypes.DWORD * 3)]
-
-class MOUSEINPUT(ctypes.Structure):
-    _fields_ = [("dx", wintypes.LONG), ("dy", wintypes.LONG), ("mouseData", wintypes.DWORD),
-                ("dwFlags", wintypes.DWORD), ("time", wintypes.DWORD),
-                ("dwExtraInfo", wintypes.ULONG_PTR)]
-
-class KEYBDINPUT(ctypes.Structure):
-    _fields_ = [("wVk", wintypes.WORD), ("wScan", wintypes.WORD),
-                ("dwFlags", wintypes.DWORD), ("time", wintypes.DWORD),
-                ("dwExtraInfo", wintypes.ULONG_PTR)]
-
-class HARDWAREINPUT(ctypes.Structure):
-    _fields_ = [("uMsg", wintypes.DWORD), ("wParamL", wintypes.WORD), ("wParamH", wintypes.WORD)]
-
-class INPUT_I(ctypes.Union):
-    _fields_ = [("mi", MOUSEINPUT), ("ki", KEYBDINPUT), ("hi", HARDWAREINPUT)]
-
-class INPUT(ctypes.Structure):
-    _fields_ = [("type", wintypes.DWORD), ("ii", INPUT_I)]
-
-user32.GetSystemMetrics.argtypes = [wintypes.INT]
-user32.GetSystemMetrics.restype = wintypes.INT
-user32.GetCursorInfo.argtypes = [ctypes.POINTER(CURSORINFO)]
-user32.GetCursorInfo.restype = wintypes.BOOL
-user32.GetIconInfo.argtypes = [wintypes.HICON, ctypes.POINTER(ICONINFO)]
-user32.GetIconInfo.restype = wintypes.BOOL
-user32.DrawIconEx.argtypes = [wintypes.HDC, wintypes.INT, wintypes.INT, wintypes.HICON,
-                              wintypes.INT, wintypes.INT, wintypes.UINT, wintypes.HBRUSH, wintypes.UINT]
-user32.DrawIconEx.restype = wintypes.BOOL
-user32.GetDC.argtypes = [wintypes.HWND]
-user32.GetDC.restype = wintypes.HDC
-user32.ReleaseDC.argtypes = [wintypes.HWND, wintypes.HDC]
-user32.ReleaseDC.restype = wintypes.INT
-user32.SetCursorPos.argtypes = [wintypes.INT, wintypes.INT]
-user32.SetCursorPos.restype = wintypes.BOOL
-user32.SendInput.argtypes = [wintypes.UINT, ctypes.POINTER(INPUT), ctypes.c_int]
-user32.SendInput.restype = wintypes.UINT
-user32.SetProcessDpiAwarenessContext.argtypes = [wintypes.HANDLE]
-user32.SetProcessDpiAwarenessContext.restype = wintypes.BOOL
-gdi32.CreateCompatibleDC.argtypes = [wintypes.HDC]
-gdi32.CreateCompatibleDC.restype = wintypes.HDC
-gdi32.DeleteDC.argtypes = [wintypes.HDC]
-gdi32.DeleteDC.restype = wintypes.BOOL
-gdi32.SelectObject.argtypes = [wintypes.HDC, wintypes.HGDIOBJ]
-gdi32.SelectObject.restype = wintypes.HGDIOBJ
-gdi32.DeleteObject.argtypes = [wintypes.HGDIOBJ]
-gdi32.DeleteObject.restype = wintypes.BOOL
-gdi32.CreateDIBSection.argtypes = [wintypes.HDC, ctypes.POINTER(BITMAPINFO), wintypes.UINT,
-                                    ctypes.POINTER(ctypes.c_void_p), wintypes.HANDLE, wintypes.DWORD]
-gdi32.CreateDIBSection.restype = wintypes.HBITMAP
-gdi32.StretchBlt.argtypes = [wintypes.HDC, wintypes.INT, wintypes.INT, wintypes.INT, wintypes.INT,
-                             wintypes.HDC, wintypes.INT, wintypes.INT, wintypes.INT, wintypes.INT, wintypes.DWORD]
-gdi32.StretchBlt.restype = wintypes.BOOL
-gdi32.SetStretchBltMode.argtypes = [wintypes.HDC, wintypes.INT]
-gdi32.SetStretchBltMode.restype = wintypes.INT
-gdi32.SetBrushOrgEx.argtypes = [wintypes.HDC, wintypes.INT, wintypes.INT, ctypes.POINTER(POINT)]
-gdi32.SetBrushOrgEx.restype = wintypes.BOOL
+# Label value escapes required by the Prometheus text exposition format
+LABEL_ESCAPES = str.maketrans({"\\": "\\\\", '"': '\\"', "\n": "\\n"})
 
-# ============================================================================
-# WINDOWS PRIMITIVES (unchanged)
-# ============================================================================
+class Metrics:
+    """Thread-safe counters, gauges and fixed-bucket histograms rendered as Prometheus text."""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self.histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], List[float]] = {}
+    
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + value
+    
+    def set(self, name: str, value: float, **labels: str) -> None:
+        with self.lock:
+            self.values[(name, tuple(sorted(labels.items())))] = value
+    
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = [0.0] * (len(METRICS_BUCKETS) + 2)
+            for i, bound in enumerate(METRICS_BUCKETS):
+                if value <= bound:
+                    hist[i] += 1
+            hist[-2] += value
+            hist[-1] += 1
+    
+    def render(self) -> str:
+        def fmt(labels: Tuple[Tuple[str, str], ...]) -> str:
+            if not labels:
+                return ""
+            return "{" + ",".join(f'{k}="{str(v).translate(LABEL_ESCAPES)}"' for k, v in labels) + "}"
+        
+        with self.lock:
+            values = sorted(self.values.items())
+            histograms = sorted((k, list(v)) for k, v in self.histograms.items())
+        lines, described = [], set()
+        for (name, labels), value in values:
+            if name not in described:
+                kind, text = METRIC_HELP.get(name, ("untyped", name))
+                lines += [f"# HELP {name} {text}", f"# TYPE {name} {kind}"]
+                described.add(name)
+            lines.append(f"{name}{fmt(labels)} {value:g}")
+        for (name, labels), hist in histograms:
+            if name not in described:
+                kind, text = METRIC_HELP.get(name, ("histogram", name))
+                lines += [f"# HELP {name} {text}", f"# TYPE {name} histogram"]
+                described.add(name)
+            for bound, count in zip(METRICS_BUCKETS, hist):
+                lines.append(f"{name}_bucket{fmt(labels + (('le', f'{bound:g}'),))} {count:g}")
+            lines.append(f"{name}_bucket{fmt(labels + (('le', '+Inf'),))} {hist[-1]:g}")
+            lines.append(f"{name}_sum{fmt(labels)} {hist[-2]:g}")
+            lines.append(f"{name}_count{fmt(labels)} {hist[-1]:g}")
+        return "\n".join(lines) + "\n"
+
+METRICS = Metrics()
+
+def start_metrics_server(port: int):
+    """Serve METRICS on 127.0.0.1:port/metrics from a daemon thread."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = METRICS.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"Metrics: http://127.0.0.1:{port}/metrics")
+    return server
 
-def init_dpi() -> None:
-    user32.SetProcessDpiAwarenessContext(DPI_AWARENESS_CONTEXT_PER_MONITOR_AWARE_V2)
+def record_usage(persona: str, resp: Dict[str, Any]) -> None:
+    usage = resp.get("usage") or {}
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if usage.get(kind):
+            METRICS.inc("agent_tokens_total", usage[kind], persona=persona, kind=kind.split("_")[0])
 
-def get_screen_size() -> Tuple[int, int]:
-    w = user32.GetSystemMetrics(SM_CXSCREEN)
-    h = user32.GetSystemMetrics(SM_CYSCREEN)
-    return (w if w > 0 else 1920, h if h > 0 else 1080)
+# ============================================================================
+# FRAMES AND INPUT (Win32 bindings live in winapi.py)
+# ============================================================================
 
 def png_pack(tag: bytes, data: bytes) -> bytes:
     chunk = tag + data
     return struct.pack("!I", len(data)) + chunk + struct.pack("!I", zlib.crc32(chunk) & 0xFFFFFFFF)
 
-def rgb_to_png(rgb: bytes, w: int, h: int) -> bytes:
-    raw = bytearray(b"".join(b"\x00" + rgb[y * w * 3:(y + 1) * w * 3] for y in range(h)))
-    compressed = zlib.compress(bytes(raw), level=6)
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1}
+
+ADLER_BASE = 65521
+DEFLATE_WINDOW = 32768
+DEFLATE_POOLS: Dict[int, Any] = {}
+
+def adler32_combine(adler1: int, adler2: int, len2: int) -> int:
+    """Adler-32 of A+B from adler32(A), adler32(B) and len(B) (zlib's adler32_combine)."""
+    rem = len2 % ADLER_BASE
+    sum1 = adler1 & 0xFFFF
+    sum2 = (rem * sum1) % ADLER_BASE
+    sum1 += (adler2 & 0xFFFF) + ADLER_BASE - 1
+    sum2 += (adler1 >> 16) + (adler2 >> 16) + ADLER_BASE - rem
+    sum1 %= ADLER_BASE
+    sum2 %= ADLER_BASE
+    return sum1 | (sum2 << 16)
+
+def zlib_header(level: int) -> bytes:
+    """2-byte zlib header (deflate, 32K window) with FLEVEL matching level."""
+    flevel = 0 if level < 2 else 1 if level < 6 else 2 if level == 6 else 3
+    cmf, flg = 0x78, flevel << 6
+    return bytes((cmf, flg + 31 - (cmf * 256 + flg) % 31))
+
+def filtered_rows(pixels: bytes, stride: int, y0: int, y1: int) -> bytes:
+    """Scanlines y0..y1 with a filter-type-0 byte in front of each."""
+    return b"".join(b"\x00" + pixels[y * stride:(y + 1) * stride] for y in range(y0, y1))
+
+def deflate_rows(pixels: bytes, stride: int, y0: int, y1: int, level: int, last: bool) -> Tuple[bytes, int, int]:
+    """Raw-deflate one block of scanlines, primed with the previous 32 KiB like pigz.
+    Non-final blocks end on a sync flush (byte-aligned, no final bit) so blocks concatenate."""
+    raw = filtered_rows(pixels, stride, y0, y1)
+    history = filtered_rows(pixels, stride, max(0, y0 - DEFLATE_WINDOW // (stride + 1) - 1), y0)[-DEFLATE_WINDOW:]
+    comp = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=history) if history else zlib.compressobj(level, zlib.DEFLATED, -15)
+    out = comp.compress(raw) + comp.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+    return out, zlib.adler32(raw), len(raw)
+
+def get_deflate_pool(threads: int):
+    if threads not in DEFLATE_POOLS:
+        from concurrent.futures import ThreadPoolExecutor
+        DEFLATE_POOLS[threads] = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="deflate")
+    return DEFLATE_POOLS[threads]
+
+def deflate_scanlines(pixels: bytes, stride: int, h: int, level: int = PNG_COMPRESS_LEVEL,
+                      threads: int = PNG_DEFLATE_THREADS, block: int = PNG_DEFLATE_BLOCK) -> bytes:
+    """zlib stream of the filtered scanlines. Large images are split into row blocks deflated
+    in parallel (zlib releases the GIL) and stitched into one stream with a combined Adler-32."""
+    threads = threads or os.cpu_count() or 1
+    if threads < 2 or (stride + 1) * h < PNG_PARALLEL_MIN:
+        return zlib.compress(filtered_rows(pixels, stride, 0, h), level)
+    rows = max(1, block // (stride + 1))
+    starts = range(0, h, rows)
+    pool = get_deflate_pool(threads)
+    jobs = [pool.submit(deflate_rows, pixels, stride, y0, min(h, y0 + rows), level, y0 + rows >= h) for y0 in starts]
+    stream = [zlib_header(level)]
+    adler = 1
+    for job in jobs:
+        out, block_adler, length = job.result()
+        stream.append(out)
+        adler = adler32_combine(adler, block_adler, length)
+    stream.append(struct.pack("!I", adler))
+    return b"".join(stream)
+
+def encode_png(pixels: bytes, w: int, h: int, bit_depth: int, color_type: int, palette: bytes = b"") -> bytes:
+    """PNG from packed scanlines (filter type 0). color_type 0 = gray, 2 = RGB, 3 = palette."""
+    stride = (w * PNG_CHANNELS[color_type] * bit_depth + 7) // 8
+    compressed = deflate_scanlines(pixels, stride, h)
     png = bytearray(b"\x89PNG\r\n\x1a\n")
-    png.extend(png_pack(b"IHDR", struct.pack("!IIBBBBB", w, h, 8, 2, 0, 0, 0)))
+    png.extend(png_pack(b"IHDR", struct.pack("!IIBBBBB", w, h, bit_depth, color_type, 0, 0, 0)))
+    if palette:
+        png.extend(png_pack(b"PLTE", palette))
     png.extend(png_pack(b"IDAT", compressed))
     png.extend(png_pack(b"IEND", b""))
     return bytes(png)
 
-def draw_cursor(hdc_mem: int, sw: int, sh: int, dw: int, dh: int) -> None:
-    ci = CURSORINFO(cbSize=ctypes.sizeof(CURSORINFO))
-    if not user32.GetCursorInfo(ctypes.byref(ci)) or not (ci.flags & CURSOR_SHOWING):
-        return
-    ii = ICONINFO()
-    if not user32.GetIconInfo(ci.hCursor, ctypes.byref(ii)):
-        return
-    try:
-        cx = int(ci.ptScreenPos.x) - int(ii.xHotspot)
-        cy = int(ci.ptScreenPos.y) - int(ii.yHotspot)
-        dx = int(round(cx * (dw / float(sw))))
-        dy = int(round(cy * (dh / float(sh))))
-        user32.DrawIconEx(hdc_mem, dx, dy, ci.hCursor, 0, 0, 0, None, DI_NORMAL)
-    finally:
-        if ii.hbmMask:
-            gdi32.DeleteObject(ii.hbmMask)
-        if ii.hbmColor:
-            gdi32.DeleteObject(ii.hbmColor)
+def rgb_to_png(rgb: bytes, w: int, h: int) -> bytes:
+    return encode_png(rgb, w, h, 8, 2)
+
+# 3-3-2 palette quantization: channel bits land in disjoint positions of the index byte
+PALETTE_LUT_R = bytes(i & 0xE0 for i in range(256))
+PALETTE_LUT_G = bytes((i & 0xE0) >> 3 for i in range(256))
+PALETTE_LUT_B = bytes(i >> 6 for i in range(256))
+PALETTE_332 = bytes(c for i in range(256) for c in (((i >> 5) & 7) * 255 // 7, ((i >> 2) & 7) * 255 // 7, (i & 3) * 255 // 3))
+NIBBLE_HI = bytes(i & 0xF0 for i in range(256))
+NIBBLE_LO = bytes(i >> 4 for i in range(256))
+
+def rgb_to_palette(rgb: bytes) -> bytes:
+    n = len(rgb) // 3
+    r = int.from_bytes(rgb[0::3].translate(PALETTE_LUT_R), "big")
+    g = int.from_bytes(rgb[1::3].translate(PALETTE_LUT_G), "big")
+    b = int.from_bytes(rgb[2::3].translate(PALETTE_LUT_B), "big")
+    return (r | g | b).to_bytes(n, "big")
+
+def pack_nibbles(plane: bytes, w: int, h: int) -> bytes:
+    """8-bit plane → 4-bit samples, two pixels per byte, rows padded to whole bytes."""
+    if w % 2:
+        plane = b"".join(plane[y * w:(y + 1) * w] + b"\x00" for y in range(h))
+    hi = int.from_bytes(plane[0::2].translate(NIBBLE_HI), "big")
+    lo = int.from_bytes(plane[1::2].translate(NIBBLE_LO), "big")
+    return (hi | lo).to_bytes(len(plane) // 2, "big")
+
+def encode_image(rgb: bytes, w: int, h: int, mode: str) -> bytes:
+    """PNG in the requested IMAGE_MODES encoding."""
+    if mode == "gray":
+        return encode_png(rgb_to_gray(rgb), w, h, 8, 0)
+    if mode == "gray4":
+        return encode_png(pack_nibbles(rgb_to_gray(rgb), w, h), w, h, 4, 0)
+    if mode == "palette":
+        return encode_png(rgb_to_palette(rgb), w, h, 8, 3, PALETTE_332)
+    return rgb_to_png(rgb, w, h)
+
+def image_mode_for(persona: str, phase: str = "") -> str:
+    for (who, prefix), mode in IMAGE_MODE_PHASES.items():
+        if who == persona and phase.upper().startswith(prefix.upper()):
+            return mode
+    return IMAGE_MODES.get(persona, "rgb")
+
+def png_to_rgb(png: bytes) -> Tuple[bytes, int, int]:
+    """Decode PNGs written by rgb_to_png (8-bit RGB, filter type 0) back to packed RGB."""
+    if png[:8] != b"\x89PNG\r\n\x1a\n":
+        raise ValueError("not a PNG")
+    pos, idat, header = 8, [], None
+    while pos < len(png):
+        length, tag = struct.unpack("!I4s", png[pos:pos + 8])
+        data = png[pos + 8:pos + 8 + length]
+        if tag == b"IHDR":
+            header = struct.unpack("!IIBBBBB", data)
+        elif tag == b"IDAT":
+            idat.append(data)
+        pos += 12 + length
+    if not header or header[2:5] != (8, 2, 0):
+        raise ValueError("unsupported PNG layout")
+    w, h = header[0], header[1]
+    raw = zlib.decompress(b"".join(idat))
+    stride = w * 3 + 1
+    if any(raw[y * stride] for y in range(h)):
+        raise ValueError("unsupported PNG filter")
+    return b"".join(raw[y * stride + 1:(y + 1) * stride] for y in range(h)), w, h
+
+def xor_bytes(a: bytes, b: bytes) -> bytes:
+    return (int.from_bytes(a, "big") ^ int.from_bytes(b, "big")).to_bytes(len(a), "big")
 
 def capture_png(tw: int, th: int) -> Tuple[bytes, int, int]:
-    sw, sh = get_screen_size()
-    hdc_scr = user32.GetDC(None)
-    if not hdc_scr:
-        raise RuntimeError("GetDC failed")
-    hdc_mem = gdi32.CreateCompatibleDC(hdc_scr)
-    if not hdc_mem:
-        user32.ReleaseDC(None, hdc_scr)
-        raise RuntimeError("CreateCompatibleDC failed")
-    
-    bmi = BITMAPINFO()
-    bmi.bmiHeader.biSize = ctypes.sizeof(BITMAPINFOHEADER)
-    bmi.bmiHeader.biWidth, bmi.bmiHeader.biHeight = tw, -th
-    bmi.bmiHeader.biPlanes, bmi.bmiHeader.biBitCount = 1, 32
-    bmi.bmiHeader.biCompression = BI_RGB
-    bits = ctypes.c_void_p()
-    hbm = gdi32.CreateDIBSection(hdc_scr, ctypes.byref(bmi), DIB_RGB_COLORS, ctypes.byref(bits), None, 0)
-    if not hbm or not bits:
-        gdi32.DeleteDC(hdc_mem)
-        user32.ReleaseDC(None, hdc_scr)
-        raise RuntimeError("CreateDIBSection failed")
-    
-    old = gdi32.SelectObject(hdc_mem, hbm)
-    gdi32.SetStretchBltMode(hdc_mem, HALFTONE)
-    gdi32.SetBrushOrgEx(hdc_mem, 0, 0, None)
-    if not gdi32.StretchBlt(hdc_mem, 0, 0, tw, th, hdc_scr, 0, 0, sw, sh, SRCCOPY):
-        gdi32.SelectObject(hdc_mem, old)
-        gdi32.DeleteObject(hbm)
-        gdi32.DeleteDC(hdc_mem)
-        user32.ReleaseDC(None, hdc_scr)
-        raise RuntimeError("StretchBlt failed")
-    
-    draw_cursor(hdc_mem, sw, sh, tw, th)
-    raw = bytes((ctypes.c_ubyte * (tw * th * 4)).from_address(bits.value))
-    gdi32.SelectObject(hdc_mem, old)
-    gdi32.DeleteObject(hbm)
-    gdi32.DeleteDC(hdc_mem)
-    user32.ReleaseDC(None, hdc_scr)
-    
-    rgb = bytearray(tw * th * 3)
-    for i in range(tw * th):
-        rgb[i * 3:i * 3 + 3] = [raw[i * 4 + 2], raw[i * 4 + 1], raw[i * 4 + 0]]
-    return rgb_to_png(bytes(rgb), tw, th), sw, sh
+    rgb, sw, sh = capture_frame(tw, th)
+    return rgb_to_png(rgb, tw, th), sw, sh
+
+# Luminance weights (sum to 256) so per-channel lanes never carry into each other
+GRAY_LUT_R = bytes((i * 77) >> 8 for i in range(256))
+GRAY_LUT_G = bytes((i * 150) >> 8 for i in range(256))
+GRAY_LUT_B = bytes((i * 29) >> 8 for i in range(256))
+
+def rgb_to_gray(rgb: bytes) -> bytes:
+    """8-bit luminance plane. Channels are weighted by table lookup and summed as big ints (one byte lane per pixel)."""
+    n = len(rgb) // 3
+    r = int.from_bytes(rgb[0::3].translate(GRAY_LUT_R), "big")
+    g = int.from_bytes(rgb[1::3].translate(GRAY_LUT_G), "big")
+    b = int.from_bytes(rgb[2::3].translate(GRAY_LUT_B), "big")
+    return (r + g + b).to_bytes(n, "big")
+
+def block_means(data: bytes, w: int, h: int, cols: int, rows: int, channels: int = 1, channel: int = 0) -> List[List[int]]:
+    """cols x rows grid of mean values of one channel, sampling FRAME_SIG_SAMPLES scanlines per block row."""
+    bw = max(1, w // cols)
+    bh = max(1, h // rows)
+    step = max(1, bh // FRAME_SIG_SAMPLES)
+    grid = []
+    for by in range(rows):
+        sums = [0] * cols
+        lines = range(by * bh, min(h, (by + 1) * bh), step)
+        for y in lines:
+            row = data[y * w * channels + channel:(y + 1) * w * channels:channels]
+            for bx in range(cols):
+                sums[bx] += sum(row[bx * bw:(bx + 1) * bw])
+        count = max(1, len(lines) * bw)
+        grid.append([min(255, s // count) for s in sums])
+    return grid
+
+def frame_signature(rgb: bytes, w: int, h: int) -> bytes:
+    """Coarse FRAME_SIG_COLS x FRAME_SIG_ROWS grid of mean green-channel values."""
+    grid = block_means(rgb, w, h, FRAME_SIG_COLS, FRAME_SIG_ROWS, 3, 1)
+    return bytes(v for row in grid for v in row)
+
+def perceptual_hash(gray: bytes, w: int, h: int) -> int:
+    """64-bit difference hash: 9x8 block means, one bit per horizontal gradient sign."""
+    value = 0
+    for row in block_means(gray, w, h, 9, 8):
+        for a, b in zip(row, row[1:]):
+            value = (value << 1) | (a > b)
+    return value
+
+def frame_change(sig_a: bytes, sig_b: bytes) -> float:
+    """Fraction of signature blocks whose luminance moved beyond tolerance."""
+    if not sig_a or not sig_b or len(sig_a) != len(sig_b):
+        return 0.0
+    changed = sum(1 for a, b in zip(sig_a, sig_b) if abs(a - b) > FRAME_SIG_TOLERANCE)
+    return changed / len(sig_a)
+
+def screenshot_path(turn: int) -> str:
+    return os.path.join(DUMP_DIR, f"{DUMP_PREFIX}{turn:04d}.png")
 
 def save_screenshot(png: bytes, turn: int) -> str:
     os.makedirs(DUMP_DIR, exist_ok=True)
-    path = os.path.join(DUMP_DIR, f"{DUMP_PREFIX}{turn:04d}.png")
+    path = screenshot_path(turn)
     with open(path, "wb") as f:
         f.write(png)
     return path
 
-def send_input(inputs) -> None:
-    arr = (INPUT * len(inputs))(*inputs)
-    if user32.SendInput(len(inputs), arr, ctypes.sizeof(INPUT)) != len(inputs):
-        raise RuntimeError("SendInput failed")
-
-def move_mouse(x: int, y: int) -> None:
-    user32.SetCursorPos(int(x), int(y))
-
 def click() -> None:
     send_input([
         INPUT(type=INPUT_MOUSE, ii=INPUT_I(mi=MOUSEINPUT(dx=0, dy=0, mouseData=0, dwFlags=MOUSEEVENTF_LEFTDOWN, time=0, dwExtraInfo=0))),
@@ -630,12 +889,267 @@ EXECUTOR_TOOLS = [
 # Tool name to definition mapping
 TOOL_REGISTRY = {tool["function"]["name"]: tool for tool in EXECUTOR_TOOLS}
 
+# Compact schema: justification guidance is stated once in the prompt instead of per tool
+COMPACT_DESCRIPTIONS = {
+    "position": "[x,y] 0-1000",
+    "evidence": "Visual proof of completion (100 words)",
+    "key": "Key or combo, e.g. 'enter', 'ctrl+c'",
+}
+
+def compact_tool(tool: Dict[str, Any]) -> Dict[str, Any]:
+    fn = tool["function"]
+    props = {}
+    for name, spec in fn["parameters"]["properties"].items():
+        spec = dict(spec)
+        if name == "justification":
+            spec.pop("description", None)
+        elif name in COMPACT_DESCRIPTIONS:
+            spec["description"] = COMPACT_DESCRIPTIONS[name]
+        props[name] = spec
+    params = dict(fn["parameters"], properties=props)
+    return {"type": "function", "function": dict(fn, parameters=params)}
+
+@lru_cache(maxsize=32)
+def encode_tools(tool_names: Tuple[str, ...], compact: bool) -> bytes:
+    """Pre-encoded JSON array of executor tool schemas, cached per tool-name tuple."""
+    tools = [TOOL_REGISTRY[name] for name in tool_names]
+    if compact:
+        tools = [compact_tool(t) for t in tools]
+        return json.dumps(tools, ensure_ascii=True, separators=(",", ":")).encode("utf-8")
+    return json.dumps(tools, ensure_ascii=True).encode("utf-8")
+
+TACTICIAN_TOOLS_JSON = json.dumps(TACTICIAN_TOOLS, ensure_ascii=True, separators=(",", ":")).encode("utf-8")
+
 CLICK_TOOLS_MAP = {
     "click_element": (click, "Clicked"),
     "double_click_element": (double_click, "Double-clicked"),
     "right_click_element": (right_click, "Right-clicked")
 }
 
+# ============================================================================
+# DOCTRINE PARSING
+# ============================================================================
+
+DOCTRINE_HEADINGS = [
+    ("mission", re.compile(r"\bMISSION\b", re.I)),
+    ("recon", re.compile(r"\bRECON", re.I)),
+    ("options", re.compile(r"\bOPTIONS?\b", re.I)),
+    ("verification", re.compile(r"\bVERIFICATION\b", re.I)),
+    ("risks", re.compile(r"\bRISKS?\b", re.I)),
+    ("directives", re.compile(r"\bDIRECTIVES?\b|\bCOMMANDER\b", re.I)),
+]
+DOCTRINE_TITLES = {
+    "mission": "MISSION RESTATEMENT",
+    "recon": "RECONNAISSANCE",
+    "options": "PHASE OPTIONS",
+    "verification": "VERIFICATION",
+    "risks": "OPERATIONAL RISKS",
+    "directives": "DIRECTIVES",
+}
+DOCTRINE_HEADER_RE = re.compile(r"^\s*(#+\s*)?(?:\*\*)?\s*(?:\d+[.)]\s*)?(?:\*\*)?\s*([A-Za-z].*?)[\s*:]*$")
+DOCTRINE_HEADING_WORDS = 6
+
+def doctrine_heading(line: str) -> Optional[str]:
+    """
+    Section key if the line is a doctrine heading, else None. A heading is a
+    markdown "#" line or a short line whose words are all capitalized (any
+    parenthetical such as "(4-7 options)" ignored), naming a known section.
+    """
+    m = DOCTRINE_HEADER_RE.match(line) if len(line) < 80 else None
+    if not m:
+        return None
+    title = re.sub(r"\([^)]*\)", " ", m.group(2))
+    words = title.split()
+    if not words or len(words) > DOCTRINE_HEADING_WORDS:
+        return None
+    if not m.group(1) and not all(w[0].isupper() or not w[0].isalpha() for w in words):
+        return None
+    return next((k for k, pattern in DOCTRINE_HEADINGS if pattern.search(title)), None)
+
+@lru_cache(maxsize=8)
+def parse_doctrine(doctrine: str) -> Dict[str, str]:
+    """Split strategist output into its 6 typed sections (callers must not mutate the result)."""
+    sections: Dict[str, List[str]] = {}
+    current = None
+    for line in doctrine.splitlines():
+        key = doctrine_heading(line)
+        if key and key not in sections:
+            current = key
+            sections[current] = []
+        elif current:
+            sections[current].append(line)
+    
+    if not sections:
+        return {"mission": doctrine.strip()}
+    return {k: "\n".join(v).strip() for k, v in sections.items() if "\n".join(v).strip()}
+
+def phase_risks(risks: str, phase: str) -> str:
+    """Risk lines mentioning the current phase or its target; all risks if none match."""
+    words = {w for w in re.split(r"[^a-z0-9]+", phase.lower()) if len(w) > 2}
+    lines = [l for l in risks.splitlines() if l.strip()]
+    relevant = [l for l in lines if words & set(re.split(r"[^a-z0-9]+", l.lower()))]
+    return "\n".join(relevant) if relevant else "\n".join(lines)
+
+def doctrine_for(persona: str, doctrine: str, phase: str = "") -> str:
+    """Render the doctrine sections a persona needs; executor risks are filtered by phase."""
+    sections = parse_doctrine(doctrine)
+    if persona == "tactician":
+        keys = list(DOCTRINE_SECTIONS_TACTICIAN)
+    else:
+        keys = list(DOCTRINE_SECTIONS_EXECUTOR)
+        for prefix, key in DOCTRINE_PHASE_SECTIONS.items():
+            if phase.upper().startswith(prefix):
+                keys.insert(1, key)
+    
+    parts = []
+    for key in keys:
+        body = sections.get(key, "")
+        if key == "risks" and persona != "tactician":
+            body = phase_risks(body, phase)
+        if body:
+            parts.append(f"{DOCTRINE_TITLES[key]}:\n{body}")
+    return "\n\n".join(parts)
+
+# ============================================================================
+# ACTION HISTORY STORE
+# ============================================================================
+
+def action_target(args: Dict[str, Any]) -> str:
+    return str(args.get("label", args.get("text", args.get("key", ""))))
+
+class ActionRecord:
+    """One executed action. Tool names and labels are interned so loop checks compare by identity."""
+    __slots__ = ("turn", "tool", "label", "target", "x", "y", "args_json", "justification", "result", "screenshot", "latency",
+                 "change")
+    
+    def __init__(self, turn: int, tool: str, args: Dict[str, Any], justification: str, result: str,
+                 screenshot: str, latency: float):
+        self.turn = turn
+        self.tool = sys.intern(tool)
+        self.label = sys.intern(str(args.get("label", "")))
+        self.target = action_target(args)[:30]
+        point = coerce_point(args.get("position") or args.get("start"))
+        self.x, self.y = (max(0, min(1000, int(point[0]))), max(0, min(1000, int(point[1])))) if point else (-1, -1)
+        self.args_json = json.dumps(args, separators=(",", ":"))
+        self.justification = justification
+        self.result = result
+        self.screenshot = screenshot
+        self.latency = round(latency, 3)
+        self.change = ""  # Changed regions seen in the next frame (set by annotate_last)
+    
+    @property
+    def failed(self) -> bool:
+        return self.result.startswith("Error:")
+    
+    def signature(self) -> Tuple[str, str]:
+        return (self.tool, self.label)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        out = {"turn": self.turn, "tool": self.tool, "args": json.loads(self.args_json),
+               "justification": self.justification, "result": self.result,
+               "screenshot": self.screenshot, "latency": self.latency}
+        if self.change:
+            out["change"] = self.change
+        return out
+
+class HistoryStore:
+    """
+    Recent actions in a fixed-capacity ring buffer (the prompt window) plus an
+    append-only columnar archive of every action: typed arrays for turn, tool id,
+    0-1000 coordinates, latency and failure; shared strings for the rest.
+    """
+    
+    def __init__(self, capacity: int, archive: bool = True):
+        self.capacity = max(1, capacity)
+        self.ring: List[Optional[ActionRecord]] = [None] * self.capacity
+        self.head = 0  # index of the oldest record
+        self.size = 0
+        self.archive = archive
+        self.tool_names: List[str] = []
+        self.tool_ids: Dict[str, int] = {}
+        self.turns = array("I")
+        self.tools = array("H")
+        self.xs = array("h")
+        self.ys = array("h")
+        self.latency_ms = array("f")
+        self.failures = array("B")
+        self.texts: List[Tuple[str, str, str, str]] = []  # (args_json, justification, result, screenshot)
+        self.changes: Dict[int, str] = {}  # archive index → changed regions (sparse)
+    
+    def __len__(self) -> int:
+        return self.size
+    
+    def __bool__(self) -> bool:
+        return self.size > 0
+    
+    def __iter__(self):
+        for i in range(self.size):
+            yield self.ring[(self.head + i) % self.capacity]
+    
+    def __reversed__(self):
+        for i in range(self.size - 1, -1, -1):
+            yield self.ring[(self.head + i) % self.capacity]
+    
+    def recent(self, n: int) -> List[ActionRecord]:
+        """Up to n newest records, oldest first."""
+        n = min(n, self.size)
+        return [self.ring[(self.head + i) % self.capacity] for i in range(self.size - n, self.size)]
+    
+    def last(self) -> Optional[ActionRecord]:
+        return self.ring[(self.head + self.size - 1) % self.capacity] if self.size else None
+    
+    def append(self, record: ActionRecord) -> Optional[ActionRecord]:
+        """Add a record; returns the record evicted from the window, if any."""
+        evicted = None
+        if self.size == self.capacity:
+            evicted = self.ring[self.head]
+            self.ring[self.head] = record
+            self.head = (self.head + 1) % self.capacity
+        else:
+            self.ring[(self.head + self.size) % self.capacity] = record
+            self.size += 1
+        if self.archive:
+            self.archive_record(record)
+        return evicted
+    
+    def archive_record(self, record: ActionRecord) -> None:
+        if record.tool not in self.tool_ids:
+            self.tool_ids[record.tool] = len(self.tool_names)
+            self.tool_names.append(record.tool)
+        self.turns.append(record.turn)
+        self.tools.append(self.tool_ids[record.tool])
+        self.xs.append(record.x)
+        self.ys.append(record.y)
+        self.latency_ms.append(record.latency * 1000)
+        self.failures.append(record.failed)
+        self.texts.append((record.args_json, record.justification, record.result, record.screenshot))
+    
+    def annotate_last(self, change: str) -> None:
+        """Attach the changed-region note to the newest record and its archive row."""
+        record = self.last()
+        if record is None:
+            return
+        record.change = change
+        if self.archive and self.texts:
+            self.changes[len(self.texts) - 1] = change
+    
+    @property
+    def archived(self) -> int:
+        return len(self.turns)
+    
+    def archive_dicts(self):
+        """Archived actions as dicts (the JSON layout of mission archives and checkpoints)."""
+        if not self.archive:
+            yield from (record.to_dict() for record in self)
+            return
+        for i, (args_json, justification, result, screenshot) in enumerate(self.texts):
+            out = {"turn": self.turns[i], "tool": self.tool_names[self.tools[i]], "args": json.loads(args_json),
+                   "justification": justification, "result": result, "screenshot": screenshot,
+                   "latency": round(self.latency_ms[i] / 1000, 3)}
+            if i in self.changes:
+                out["change"] = self.changes[i]
+            yield out
+
 # ============================================================================
 # AGENT STATE
 # ============================================================================
@@ -644,9 +1158,36 @@ class AgentState:
     def __init__(self, task: str, initial_screenshot: bytes, screen_dims: Tuple[int, int]):
         self.task = task
         self.screenshot = initial_screenshot
+        self.screenshot_b64 = ""
+        self.frame_rgb = b""
+        self.recent_frames: Deque[Tuple[int, bytes]] = deque(maxlen=CONTACT_SHEET_FRAMES + 1)  # (turn, rgb)
+        self.image_b64: Dict[str, str] = {}  # Per-mode encodings of the current frame
+        self.mission_id = time.strftime("%Y%m%d-%H%M%S") + "-" + hashlib.sha1(task.encode("utf-8")).hexdigest()[:8]
+        self.frame_base: Optional[Tuple[str, bytes, int]] = None  # (digest, rgb, chain) for delta encoding
+        self.frame_gray = b""
+        self.frame_quant: Optional[Tuple[bytes, bytes]] = None  # quantize_frame of the last raw frame
+        self.cursor_pos: Optional[Tuple[int, int]] = None  # Screen cursor position when it was captured
+        self.foreground_app = "unknown"
+        
+        # State graph memory
+        self.graph_node: Optional[int] = None
+        self.pending_edge: Optional[Tuple[int, str, str, str, bool, float]] = None
+        self.route_hint = ""
+        self.autopilot_step: Optional[Tuple] = None
         self.screen_dims = screen_dims
         self.turn = 0
-        self.history: List[Dict[str, Any]] = []
+        self.history = HistoryStore(MAX_HISTORY_ITEMS, archive=ENABLE_FULL_ARCHIVE)
+        
+        # Rolling summary of turns pruned from history
+        self.summary_first_turn = 0
+        self.summary_last_turn = 0
+        self.summary_tool_counts: Dict[str, int] = {}
+        self.summary_errors = 0
+        self.summary_labels: List[str] = []
+        self.summary_text = ""
+        
+        # Cached stable context prefixes (mission + doctrine slice), keyed per persona/phase
+        self.context_prefixes: Dict[Tuple[str, str, str, str], str] = {}
         
         # Three-body hierarchy state
         self.strategist_doctrine: str = ""
@@ -655,45 +1196,183 @@ class AgentState:
         self.current_phase: str = "INIT"
         self.current_tool_names: List[str] = []  # Tool names, not full definitions
         
-        if ENABLE_FULL_ARCHIVE:
-            self.full_archive: List[Dict[str, Any]] = []
+        # Oversight trigger state
+        self.last_tactician_turn = 0
+        self.frame_sig: bytes = b""
+        self.prev_frame_sig: bytes = b""
+        self.error_streak = 0
+        self.executor_missed = False
+        
+        # Per-stage wall times (seconds) for the turn pipeline
+        self.stage_timings: Dict[str, List[float]] = {}
+        self.turn_stages: Dict[str, float] = {}
+        self.settle_delay = TIMING_TURN_DELAY
+        
+        # Trajectory counters for the mission archive
+        self.started = time.time()
+        self.phase_log: List[Tuple[int, str, float]] = []
+        self.tactician_calls = 0
+        self.reconfigurations = 0
+        self.loop_turns = 0
+        self.strategist_seconds = 0.0
+        self.warmups: Dict[str, int] = {}
+        self.warm_done: Dict[str, float] = {}  # persona -> seconds of its last completed warmup (written by warmup threads)
+        self.first_call_warmed: Dict[str, bool] = {}  # persona -> a warmup had completed when its first call started
+        self.budget = MissionBudget(MISSION_TIME_BUDGET)
     
     def increment_turn(self):
         self.turn += 1
     
-    def update_screenshot(self, png: bytes):
+    def update_screenshot(self, png: bytes, frame_sig: bytes = b"", b64: str = "", rgb: bytes = b""):
         self.screenshot = png
+        self.screenshot_b64 = b64
+        self.frame_rgb = rgb
+        if rgb:
+            self.recent_frames.append((self.turn, rgb))
+        self.image_b64 = {}
+        self.prev_frame_sig = self.frame_sig
+        self.frame_sig = frame_sig
     
-    def add_history(self, tool: str, args: Dict, justification: str, result: str, screenshot_path: str):
-        entry = {
-            "turn": self.turn,
-            "tool": tool,
-            "args": args,
-            "justification": justification,
-            "result": result,
-            "screenshot": screenshot_path
-        }
-        self.history.append(entry)
-        
-        if ENABLE_FULL_ARCHIVE:
-            self.full_archive.append(entry)
+    def add_history(self, tool: str, args: Dict, justification: str, result: str, screenshot_path: str,
+                    latency: float = 0.0):
+        record = ActionRecord(self.turn, tool, args, justification, result, screenshot_path, latency)
+        evicted = self.history.append(record)
+        self.error_streak = self.error_streak + 1 if record.failed else 0
+        if evicted:
+            summarize_pruned(self, [evicted])
+    
+    def get_screenshot_b64(self) -> str:
+        if not self.screenshot_b64:
+            self.screenshot_b64 = base64.b64encode(self.screenshot).decode("ascii")
+        return self.screenshot_b64
+    
+    def get_image_b64(self, persona: str) -> str:
+        """Current frame in the persona's image mode for the current phase (RGB PNG if no raw frame)."""
+        mode = image_mode_for(persona, self.current_phase)
+        if mode == "rgb" or not self.frame_rgb:
+            return self.get_screenshot_b64()
+        if mode not in self.image_b64:
+            png = encode_image(self.frame_rgb, AGENT_IMAGE_W, AGENT_IMAGE_H, mode)
+            self.image_b64[mode] = base64.b64encode(png).decode("ascii")
+        return self.image_b64[mode]
+    
+    def record_stage(self, name: str, seconds: float):
+        self.stage_timings.setdefault(name, []).append(seconds)
+        self.turn_stages[name] = self.turn_stages.get(name, 0.0) + seconds
+        if name in ("tactician", "executor"):
+            METRICS.observe("agent_inference_seconds", seconds, persona=name)
+        else:
+            METRICS.observe("agent_stage_seconds", seconds, stage=name)
     
     def update_executor_context(self, prompt: str, phase: str, tool_names: List[str]):
         """Update executor configuration from tactician tool calls."""
+        METRICS.set("agent_phase", 0, phase=self.current_phase)
+        METRICS.set("agent_phase", 1, phase=phase)
         self.current_executor_prompt = prompt
         self.current_phase = phase
         self.current_tool_names = tool_names
+        self.reconfigurations += 1
+        if not self.phase_log or self.phase_log[-1][1] != phase:
+            self.phase_log.append((self.turn, phase, time.time()))
     
     def get_executor_tools(self) -> List[Dict]:
         """Filter EXECUTOR_TOOLS to only include current phase tools."""
-        if not self.current_tool_names:
-            return []
-        return [TOOL_REGISTRY[name] for name in self.current_tool_names if name in TOOL_REGISTRY]
+        return [TOOL_REGISTRY[name] for name in self.get_executor_tool_names()]
+    
+    def get_executor_tool_names(self) -> Tuple[str, ...]:
+        """Current phase tool names known to TOOL_REGISTRY (cache key for encode_tools)."""
+        return tuple(name for name in self.current_tool_names if name in TOOL_REGISTRY)
+
+# ============================================================================
+# REQUEST POLICY
+# ============================================================================
+
+class InferenceError(RuntimeError):
+    """
+    A failed inference request. reason is one of: timeout, connection, rate_limited,
+    server_error, bad_request, bad_response, deadline. retryable is set only when the
+    server cannot have started processing it, so a retry never repeats an inference.
+    """
+    
+    def __init__(self, reason: str, detail: str = "", status: int = 0, retry_after: Optional[float] = None,
+                 retryable: bool = False):
+        super().__init__(f"{reason}: {detail}" if detail else reason)
+        self.reason = reason
+        self.status = status
+        self.retry_after = retry_after
+        self.retryable = retryable
+        self.persona = ""
+        self.attempts = 0
+
+class RequestPolicy:
+    """Recent request latency per persona (for timeouts) and the retry backoff schedule."""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, Deque[float]] = {}
+    
+    def record(self, persona: str, seconds: float) -> None:
+        with self.lock:
+            self.latencies.setdefault(persona, deque(maxlen=REQUEST_LATENCY_WINDOW)).append(seconds)
+    
+    def timeout_for(self, persona: str) -> float:
+        """REQUEST_TIMEOUT_FACTOR × the persona's p95 latency, or LMSTUDIO_TIMEOUT until enough samples exist."""
+        with self.lock:
+            samples = sorted(self.latencies.get(persona, ()))
+        if len(samples) < REQUEST_TIMEOUT_SAMPLES:
+            return float(LMSTUDIO_TIMEOUT)
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        return max(REQUEST_TIMEOUT_MIN, min(float(LMSTUDIO_TIMEOUT), REQUEST_TIMEOUT_FACTOR * p95))
+    
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Equal-jitter exponential delay before retry attempt (0-based); honours Retry-After up to the cap."""
+        import random
+        cap = min(REQUEST_BACKOFF_MAX, REQUEST_BACKOFF_BASE * 2 ** attempt)
+        delay = cap / 2 + random.uniform(0, cap / 2)
+        return max(delay, min(retry_after, REQUEST_BACKOFF_MAX)) if retry_after else delay
+
+REQUEST_POLICY = RequestPolicy()
+
+class MissionBudget:
+    """Wall-clock budget of one mission. As the deadline nears, request timeouts and max_tokens shrink."""
+    
+    def __init__(self, seconds: float = MISSION_TIME_BUDGET):
+        self.seconds = seconds
+        self.deadline = time.perf_counter() + seconds if seconds > 0 else None
+        self.lock = threading.Lock()
+        self.failures: Dict[str, int] = {}  # reason → failed requests
+    
+    def remaining(self) -> float:
+        return self.deadline - time.perf_counter() if self.deadline is not None else float("inf")
+    
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+    
+    def cap_tokens(self, max_tokens: int) -> int:
+        remaining = self.remaining()
+        if remaining >= DEADLINE_TOKEN_HORIZON:
+            return max_tokens
+        scaled = int(max_tokens * max(0.0, remaining) / DEADLINE_TOKEN_HORIZON)
+        return max(min(max_tokens, DEADLINE_MIN_TOKENS), scaled)
+    
+    def record_failure(self, reason: str) -> None:
+        with self.lock:
+            self.failures[reason] = self.failures.get(reason, 0) + 1
 
 # ============================================================================
 # UTILITY FUNCTIONS
 # ============================================================================
 
+def coerce_point(point: Any) -> Optional[Tuple[float, float]]:
+    """A [x, y] argument as floats the way clicks coerce it (numeric strings included); None for anything else, bools, NaN or infinity."""
+    if not isinstance(point, (list, tuple)) or len(point) != 2 or any(isinstance(v, bool) for v in point):
+        return None
+    try:
+        x, y = float(point[0]), float(point[1])
+    except (TypeError, ValueError):
+        return None
+    return (x, y) if math.isfinite(x) and math.isfinite(y) else None
+
 def norm_to_px(xn: float, yn: float, sw: int, sh: int) -> Tuple[int, int]:
     xn = max(0.0, min(1000.0, xn))
     yn = max(0.0, min(1000.0, yn))
@@ -701,42 +1380,241 @@ def norm_to_px(xn: float, yn: float, sw: int, sh: int) -> Tuple[int, int]:
     py = min(int(round((yn / 1000.0) * sh)), sh - 1)
     return (px, py)
 
-def post_json(payload: Dict[str, Any]) -> Dict[str, Any]:
-    data = json.dumps(payload, ensure_ascii=True).encode("utf-8")
-    req = urllib.request.Request(LMSTUDIO_ENDPOINT, data=data, headers={"Content-Type": "application/json"}, method="POST")
+# Idle keep-alive connections to LMSTUDIO_ENDPOINT. The pool is process-wide, so connections
+# outlive the worker threads of each mission's event loop and are reused across missions.
+HTTP_POOL: List["http.client.HTTPConnection"] = []
+HTTP_POOL_LOCK = threading.Lock()
+
+def connection_idle(conn: "http.client.HTTPConnection") -> bool:
+    """False if the server has closed (or written to) an idle pooled connection."""
+    import select
+    if conn.sock is None:
+        return True
     try:
-        with urllib.request.urlopen(req, timeout=LMSTUDIO_TIMEOUT) as resp:
-            return json.loads(resp.read().decode("utf-8"))
-    except Exception as e:
-        print(f"API failed: {e}")
-        raise
+        readable, _, _ = select.select([conn.sock], [], [], 0)
+    except (OSError, ValueError):
+        return False
+    return not readable
+
+def acquire_connection() -> "http.client.HTTPConnection":
+    """An idle pooled connection that is still open, or a new one. Hand it back with release_connection."""
+    while True:
+        with HTTP_POOL_LOCK:
+            if not HTTP_POOL:
+                break
+            conn = HTTP_POOL.pop()
+        if connection_idle(conn):
+            return conn
+        conn.close()
+    import http.client
+    import urllib.parse
+    url = urllib.parse.urlsplit(LMSTUDIO_ENDPOINT)
+    cls = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+    return cls(url.hostname, url.port, timeout=LMSTUDIO_TIMEOUT)
+
+def release_connection(conn: "http.client.HTTPConnection") -> None:
+    """Return a connection whose response was fully read; closes it if the pool is full."""
+    with HTTP_POOL_LOCK:
+        if len(HTTP_POOL) < LMSTUDIO_POOL_SIZE:
+            HTTP_POOL.append(conn)
+            return
+    conn.close()
+
+def send_request(path: str, data: bytes, timeout: float) -> Dict[str, Any]:
+    """
+    One POST on a pooled keep-alive connection. Failures are raised as InferenceError,
+    retryable only while the request had not been fully sent (the server cannot have
+    started an inference) or when the server answered 408, 429 or 503.
+    """
+    import http.client
+    import socket
+    conn = acquire_connection()
+    conn.timeout = timeout
+    if conn.sock is not None:
+        conn.sock.settimeout(timeout)
+    sent = False
+    try:
+        conn.request("POST", path, body=data, headers={"Content-Type": "application/json"})
+        sent = True
+        resp = conn.getresponse()
+        body = resp.read()
+    except socket.timeout as e:
+        conn.close()
+        waited = "no response" if sent else "request not sent"
+        raise InferenceError("timeout", f"{waited} within {timeout:.1f}s", retryable=not sent) from e
+    except (OSError, http.client.HTTPException) as e:
+        conn.close()
+        detail = str(e) or type(e).__name__
+        raise InferenceError("connection", detail if not sent else f"{detail} after the request was sent",
+                             retryable=not sent) from e
+    release_connection(conn)
+    if resp.status >= 400:
+        if resp.status == 429:
+            reason = "rate_limited"
+        elif resp.status == 408:
+            reason = "timeout"
+        else:
+            reason = "server_error" if resp.status >= 500 else "bad_request"
+        retry_after = resp.getheader("Retry-After", "")
+        raise InferenceError(reason, f"HTTP {resp.status}: {body[:200].decode('utf-8', 'replace')}", resp.status,
+                             float(retry_after) if retry_after.isdigit() else None,
+                             retryable=resp.status in (408, 429, 503))
+    try:
+        return json.loads(body.decode("utf-8"))
+    except ValueError as e:
+        raise InferenceError("bad_response", str(e)) from e
 
-def build_history_text(state: AgentState) -> str:
-    """Compact history with doctrine context."""
-    lines = [f"MISSION: {state.task}\n"]
+def post_json(payload: Dict[str, Any], tools_json: Optional[bytes] = None, persona: str = "",
+              budget: Optional[MissionBudget] = None, retries: int = REQUEST_RETRIES) -> Dict[str, Any]:
+    """
+    POST a chat completion under the request policy. Each attempt's timeout follows the
+    persona's observed latency and never outlasts the mission budget, which also scales
+    max_tokens down near the deadline. Failures the server cannot have started working on
+    are retried with backoff; anything else fails at once. Raises InferenceError.
+    """
+    if budget is not None and "max_tokens" in payload:
+        payload = dict(payload, max_tokens=budget.cap_tokens(payload["max_tokens"]))
+    data = json.dumps(payload, ensure_ascii=True).encode("utf-8")
+    if tools_json is not None:
+        # Splice pre-encoded tool schemas instead of re-serializing them
+        data = data[:-1] + b', "tools": ' + tools_json + b"}"
+    import urllib.parse
+    path = urllib.parse.urlsplit(LMSTUDIO_ENDPOINT).path or "/"
+    label = persona or "other"
+    attempt = 0
+    while True:
+        attempt += 1
+        start = time.perf_counter()
+        try:
+            timeout = REQUEST_POLICY.timeout_for(persona)
+            if budget is not None:
+                if budget.expired():
+                    raise InferenceError("deadline", "mission time budget spent")
+                timeout = min(timeout, budget.remaining())
+            result = send_request(path, data, timeout)
+            REQUEST_POLICY.record(persona, time.perf_counter() - start)
+            return result
+        except InferenceError as e:
+            error = e
+        if error.reason == "timeout" and not error.retryable:
+            # Slow answers still count, so the next timeout stretches instead of firing again
+            REQUEST_POLICY.record(persona, time.perf_counter() - start)
+        if not error.retryable or attempt > retries:
+            break
+        delay = REQUEST_POLICY.backoff(attempt - 1, error.retry_after)
+        if budget is not None and delay >= budget.remaining():
+            error = InferenceError("deadline", f"no time left to retry ({error})")
+            break
+        METRICS.inc("agent_request_retries_total", persona=label, reason=error.reason)
+        print(f"⚠️ {label} request {error}; retry {attempt}/{retries} in {delay:.1f}s")
+        time.sleep(delay)
+    error.persona, error.attempts = persona, attempt
+    METRICS.inc("agent_errors_total", kind="api")
+    METRICS.inc("agent_request_failures_total", persona=label, reason=error.reason)
+    if budget is not None:
+        budget.record_failure(error.reason)
+    print(f"API failed ({label}, {attempt} attempt{'s' if attempt > 1 else ''}): {error}")
+    raise error
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CONTEXT_CHARS_PER_TOKEN - 1) // CONTEXT_CHARS_PER_TOKEN
+
+def fit_lines(text: str, max_tokens: int) -> str:
+    """Keep whole lines of text while within max_tokens; mark truncation with '...'."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    kept, used = [], estimate_tokens("...")
+    for line in text.splitlines():
+        cost = estimate_tokens(line + "\n")
+        if used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    kept.append("...")
+    return "\n".join(kept)
+
+def format_action_line(h: ActionRecord) -> str:
+    line = f"  T{h.turn}: {h.tool}({h.target}) → {h.result[:60]}"
+    return f"{line}; {h.change}" if h.change else line
+
+def context_prefix(state: AgentState, persona: str) -> str:
+    """Mission + doctrine slice, cached per persona/phase so it stays byte-identical between calls."""
+    phase = state.current_phase if persona == "executor" else ""
+    key = (persona, phase, state.task, state.strategist_doctrine)
+    if key not in state.context_prefixes:
+        mission = f"MISSION: {state.task}\n"
+        lines = [mission]
+        # Tactician already carries its doctrine slice in the system prompt
+        if state.strategist_doctrine and persona == "executor":
+            reserve = estimate_tokens(mission) + CONTEXT_MIN_RECENT * CONTEXT_ACTION_TOKENS + CONTEXT_SUMMARY_TOKENS
+            budget = max(0, min(CONTEXT_DOCTRINE_TOKENS, CONTEXT_TOKEN_BUDGET - reserve))
+            guidance = doctrine_for(persona, state.strategist_doctrine, phase)
+            lines.append(f"DOCTRINE:\n{fit_lines(guidance, budget)}\n")
+        state.context_prefixes[key] = "\n".join(lines)
+    return state.context_prefixes[key]
+
+def summarize_pruned(state: AgentState, entries: List[ActionRecord]) -> None:
+    """Fold entries evicted from the history window into the rolling summary."""
+    if not entries:
+        return
+    if not state.summary_first_turn:
+        state.summary_first_turn = entries[0].turn
+    state.summary_last_turn = entries[-1].turn
+    for h in entries:
+        state.summary_tool_counts[h.tool] = state.summary_tool_counts.get(h.tool, 0) + 1
+        if h.failed:
+            state.summary_errors += 1
+        label = h.label[:20]
+        if label and label not in state.summary_labels:
+            state.summary_labels.append(label)
+    state.summary_labels = state.summary_labels[-6:]
     
-    if state.strategist_doctrine:
-        lines.append(f"DOCTRINE:\n{state.strategist_doctrine[:400]}...\n")
+    counts = ", ".join(f"{tool}×{n}" for tool, n in sorted(state.summary_tool_counts.items()))
+    text = f"EARLIER (T{state.summary_first_turn}-T{state.summary_last_turn}): {counts}"
+    if state.summary_errors:
+        text += f"; {state.summary_errors} errors"
+    if state.summary_labels:
+        text += f"; targets: {', '.join(state.summary_labels)}"
+    state.summary_text = fit_lines(text, CONTEXT_SUMMARY_TOKENS)
+
+def build_history_text(state: AgentState, persona: str = "executor") -> str:
+    """Token-budgeted history: stable prefix first, volatile recent actions last."""
+    prefix = context_prefix(state, persona)
+    lines = [prefix]
+    
+    if state.summary_text:
+        lines.append(f"{state.summary_text}\n")
     
     lines.append(f"CURRENT PHASE: {state.current_phase}\n")
     
-    if state.history:
-        lines.append("RECENT ACTIONS:")
-        for h in state.history[-8:]:
-            target = h['args'].get('label', h['args'].get('text', h['args'].get('key', '')))[:30]
-            outcome = h['result'][:60]
-            lines.append(f"  T{h['turn']}: {h['tool']}({target}) → {outcome}")
+    if state.route_hint:
+        lines.append(f"{state.route_hint}\n")
     
     # Loop warnings
+    warning = ""
     if ENABLE_ACTIVE_LOOP_PREVENTION and len(state.history) >= 2:
-        recent = [h for h in state.history[-4:]]
-        if len(recent) >= 2:
-            last = recent[-1]
-            last_sig = (last['tool'], last['args'].get('label', ''))
-            matches = sum(1 for h in recent if (h['tool'], h['args'].get('label', '')) == last_sig)
-            
-            if matches >= LOOP_DETECTION_THRESHOLD:
-                lines.append(f"\n⚠️ LOOP: {last['tool']} on '{last['args'].get('label', '')}' repeated {matches}× - CHANGE APPROACH ⚠️")
+        recent = state.history.recent(4)
+        last = recent[-1]
+        matches = sum(1 for h in recent if h.signature() == last.signature())
+        
+        if matches >= LOOP_DETECTION_THRESHOLD:
+            warning = f"\n⚠️ LOOP: {last.tool} on '{last.label}' repeated {matches}× - CHANGE APPROACH ⚠️"
+    
+    if state.history:
+        remaining = CONTEXT_TOKEN_BUDGET - sum(estimate_tokens(l + "\n") for l in lines) - estimate_tokens(warning)
+        actions: List[str] = []
+        for h in reversed(state.history):
+            line = format_action_line(h)
+            cost = estimate_tokens(line + "\n")
+            if len(actions) >= CONTEXT_MIN_RECENT and cost > remaining:
+                break
+            actions.append(line)
+            remaining -= cost
+        lines.append("RECENT ACTIONS:")
+        lines.extend(reversed(actions))
+    
+    if warning:
+        lines.append(warning)
     
     return "\n".join(lines)
 
@@ -744,30 +1622,792 @@ def detect_terminal_loop(state: AgentState) -> bool:
     if not ENABLE_ACTIVE_LOOP_PREVENTION or len(state.history) < 4:
         return False
     
-    recent = [h for h in state.history[-5:]]
+    recent = state.history.recent(5)
     
     if len(recent) < LOOP_DETECTION_THRESHOLD:
         return False
     
-    last = recent[-1]
-    last_sig = (last["tool"], last["args"].get("label", ""))
-    matches = sum(1 for h in recent if (h["tool"], h["args"].get("label", "")) == last_sig)
+    last_sig = recent[-1].signature()
+    matches = sum(1 for h in recent if h.signature() == last_sig)
     
     return matches >= LOOP_DETECTION_THRESHOLD
 
-def prune_history(history: List[Dict], max_items: int) -> List[Dict]:
-    if len(history) <= max_items:
-        return history
+def tactician_trigger(state: AgentState) -> Optional[str]:
+    """Return the reason oversight is needed this turn, or None if the run looks healthy."""
+    if state.turn == 1 or not state.current_executor_prompt:
+        return "initial"
     
-    recent = history[-max_items:]
-    return recent
+    since = state.turn - state.last_tactician_turn
+    if since >= TACTICIAN_MAX_STALENESS:
+        return f"staleness ({since} turns)"
+    if since < TACTICIAN_COOLDOWN:
+        return None
+    
+    if state.executor_missed:
+        return "executor returned no tool call"
+    if state.error_streak >= TACTICIAN_ERROR_STREAK:
+        return f"{state.error_streak} consecutive errors"
+    if detect_terminal_loop(state):
+        return "loop detected"
+    
+    change = frame_change(state.prev_frame_sig, state.frame_sig)
+    if change >= TACTICIAN_VISUAL_CHANGE:
+        return f"visual change ({change:.0%} of screen)"
+    
+    return None
+
+# ============================================================================
+# CLICK TARGET CACHE
+# ============================================================================
+
+def extract_patch(gray: bytes, w: int, h: int, cx: int, cy: int, size: int) -> Tuple[bytes, int, int]:
+    """size x size patch centered near (cx, cy), clamped inside the frame. Returns (patch, x0, y0)."""
+    size = min(size, w, h)
+    x0 = max(0, min(w - size, cx - size // 2))
+    y0 = max(0, min(h - size, cy - size // 2))
+    return b"".join(gray[(y0 + r) * w + x0:(y0 + r) * w + x0 + size] for r in range(size)), x0, y0
+
+def patch_variance(patch: bytes) -> float:
+    n = len(patch)
+    total = sum(patch)
+    return (sum(map(mul, patch, patch)) - total * total / n) / n if n else 0.0
+
+def match_patch(gray: bytes, w: int, h: int, patch: bytes, size: int,
+                cx: int, cy: int, radius: int) -> Tuple[float, int, int, float]:
+    """
+    Normalized cross-correlation search for patch within radius of (cx, cy).
+    Window sums come from integral images of the search region and row dot
+    products run through map(mul) in C; coarse step-2 search, then ±1 refinement.
+    Returns (score, center_x, center_y, runner_up), where runner_up is the best
+    score at least half a patch away from the winner (a second copy of the target).
+    """
+    n = size * size
+    p_sum = sum(patch)
+    p_var = sum(map(mul, patch, patch)) - p_sum * p_sum / n
+    if p_var <= 0:
+        return (0.0, cx, cy, 0.0)
+    rows = [patch[r * size:(r + 1) * size] for r in range(size)]
+    
+    lo_x, hi_x = max(0, cx - size // 2 - radius), min(w - size, cx - size // 2 + radius)
+    lo_y, hi_y = max(0, cy - size // 2 - radius), min(h - size, cy - size // 2 + radius)
+    if lo_x > hi_x or lo_y > hi_y:
+        return (0.0, cx, cy, 0.0)
+    
+    # Integral images (sum and sum of squares) over the search region
+    rw = hi_x - lo_x + size
+    ii = [[0] * (rw + 1)]
+    ii_sq = [[0] * (rw + 1)]
+    for y in range(lo_y, hi_y + size):
+        row = gray[y * w + lo_x:y * w + lo_x + rw]
+        ii.append(list(map(add, ii[-1], accumulate(row, initial=0))))
+        ii_sq.append(list(map(add, ii_sq[-1], accumulate(map(mul, row, row), initial=0))))
+    
+    def score(x0: int, y0: int) -> float:
+        ix, iy = x0 - lo_x, y0 - lo_y
+        total = ii[iy + size][ix + size] - ii[iy][ix + size] - ii[iy + size][ix] + ii[iy][ix]
+        sq = ii_sq[iy + size][ix + size] - ii_sq[iy][ix + size] - ii_sq[iy + size][ix] + ii_sq[iy][ix]
+        var = sq - total * total / n
+        if var <= 0:
+            return -1.0
+        dot = 0
+        for r in range(size):
+            off = (y0 + r) * w + x0
+            dot += sum(map(mul, gray[off:off + size], rows[r]))
+        return (dot - total * p_sum / n) / math.sqrt(var * p_var)
+    
+    def refine(peak: Tuple[float, int, int]) -> Tuple[float, int, int]:
+        _, bx, by = peak
+        return max([peak] + [(score(x, y), x, y)
+                             for y in range(max(lo_y, by - 1), min(hi_y, by + 1) + 1)
+                             for x in range(max(lo_x, bx - 1), min(hi_x, bx + 1) + 1)])
+    
+    coarse = [(score(x, y), x, y) for y in range(lo_y, hi_y + 1, 2) for x in range(lo_x, hi_x + 1, 2)]
+    best = refine(max(coarse))
+    apart = max(1, size // 2)
+    others = [c for c in coarse if max(abs(c[1] - best[1]), abs(c[2] - best[2])) >= apart]
+    runner_up = refine(max(others))[0] if others else -1.0
+    return (best[0], best[1] + size // 2, best[2] + size // 2, runner_up)
+
+class TargetCache:
+    """LRU map of (app, label) → grayscale patch around the last successful click on that target."""
+    
+    def __init__(self, capacity: int = TARGET_CACHE_CAPACITY):
+        self.capacity = capacity
+        self.entries: "OrderedDict[Tuple[str, str], Tuple[bytes, int]]" = OrderedDict()
+        self.hits = 0
+        self.snaps = 0
+        self.ambiguous = 0
+    
+    @staticmethod
+    def key(app: str, label: str) -> Tuple[str, str]:
+        return (app, " ".join(label.lower().split()))
+    
+    def put(self, app: str, label: str, gray: bytes, w: int, h: int, cx: int, cy: int) -> None:
+        patch, _, _ = extract_patch(gray, w, h, cx, cy, TARGET_PATCH_SIZE)
+        if patch_variance(patch) < TARGET_MIN_VARIANCE:
+            return
+        key = self.key(app, label)
+        self.entries[key] = (patch, min(TARGET_PATCH_SIZE, w, h))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+    
+    def locate(self, app: str, label: str, gray: bytes, w: int, h: int,
+               cx: int, cy: int) -> Optional[Tuple[float, int, int]]:
+        """
+        Best match (score, x, y) near (cx, cy), or None if the label is unknown,
+        the match is weak, or another copy of the target also matches and the
+        best one is not within TARGET_SNAP_NEAR px of the predicted point.
+        """
+        key = self.key(app, label)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        patch, size = entry
+        score, x, y, runner_up = match_patch(gray, w, h, patch, size, cx, cy, TARGET_SEARCH_RADIUS)
+        if score < TARGET_MATCH_THRESHOLD:
+            return None
+        if runner_up >= TARGET_MATCH_THRESHOLD and max(abs(x - cx), abs(y - cy)) > TARGET_SNAP_NEAR:
+            self.ambiguous += 1
+            return None
+        return (score, x, y)
+
+TARGET_CACHE = TargetCache()
+
+def snap_click_target(state: AgentState, tool_args: Dict[str, Any]) -> None:
+    """Refine a click position in place using the target cache for the foreground app."""
+    label, position = tool_args.get("label", ""), tool_args.get("position")
+    point = coerce_point(position)
+    if not label or not state.frame_gray or point is None:
+        return
+    cx, cy = target_pixel(point)
+    match = TARGET_CACHE.locate(state.foreground_app, label, state.frame_gray, AGENT_IMAGE_W, AGENT_IMAGE_H, cx, cy)
+    if match:
+        score, mx, my = match
+        snapped = [round((mx + 0.5) * 1000.0 / AGENT_IMAGE_W), round((my + 0.5) * 1000.0 / AGENT_IMAGE_H)]
+        TARGET_CACHE.snaps += 1
+        print(f"Snap: {label} {position} → {snapped} (ncc {score:.2f})")
+        tool_args["position"] = snapped
+
+def target_pixel(point: Tuple[float, float]) -> Tuple[int, int]:
+    """0-1000 point → pixel in the AGENT_IMAGE_W x AGENT_IMAGE_H frame, clamped inside it."""
+    cx = max(0, min(AGENT_IMAGE_W - 1, int(point[0] / 1000.0 * AGENT_IMAGE_W)))
+    cy = max(0, min(AGENT_IMAGE_H - 1, int(point[1] / 1000.0 * AGENT_IMAGE_H)))
+    return cx, cy
+
+def remember_click_target(state: AgentState, tool_args: Dict[str, Any]) -> None:
+    label = tool_args.get("label", "")
+    point = coerce_point(tool_args.get("position"))
+    if not label or not state.frame_gray or point is None:
+        return
+    cx, cy = target_pixel(point)
+    TARGET_CACHE.put(state.foreground_app, label, state.frame_gray, AGENT_IMAGE_W, AGENT_IMAGE_H, cx, cy)
+
+# ============================================================================
+# STATE GRAPH MEMORY
+# ============================================================================
+
+GRAPH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    hash INTEGER PRIMARY KEY, band0 INTEGER, band1 INTEGER, band2 INTEGER, band3 INTEGER,
+    app TEXT, visits INTEGER DEFAULT 0, last_seen REAL
+);
+CREATE INDEX IF NOT EXISTS nodes_band0 ON nodes(band0);
+CREATE INDEX IF NOT EXISTS nodes_band1 ON nodes(band1);
+CREATE INDEX IF NOT EXISTS nodes_band2 ON nodes(band2);
+CREATE INDEX IF NOT EXISTS nodes_band3 ON nodes(band3);
+CREATE TABLE IF NOT EXISTS edges (
+    src INTEGER, dst INTEGER, tool TEXT, label TEXT, args TEXT,
+    attempts INTEGER DEFAULT 0, successes INTEGER DEFAULT 0, latency_total REAL DEFAULT 0,
+    PRIMARY KEY (src, tool, label, dst)
+);
+CREATE TABLE IF NOT EXISTS goals (
+    task TEXT, hash INTEGER, count INTEGER DEFAULT 0, PRIMARY KEY (task, hash)
+);
+"""
+
+def to_signed64(value: int) -> int:
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+def hash_bands(value: int) -> List[int]:
+    return [(value >> (16 * i)) & 0xFFFF for i in range(4)]
+
+class StateGraph:
+    """
+    Persistent state-transition graph. Nodes are perceptual frame hashes (near
+    duplicates merged via 16-bit band indexes), edges are executed actions with
+    success counts and latencies, goals are frames where a mission completed.
+    """
+    
+    def __init__(self, path: str = GRAPH_DB_PATH):
+        import sqlite3
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(GRAPH_SCHEMA)
+    
+    def resolve(self, value: int) -> int:
+        """Stored node hash within GRAPH_HASH_DISTANCE of value, or value itself if unseen."""
+        signed = to_signed64(value)
+        if self.db.execute("SELECT 1 FROM nodes WHERE hash = ?", (signed,)).fetchone():
+            return signed
+        bands = hash_bands(value)
+        rows = self.db.execute(
+            "SELECT hash FROM nodes WHERE band0 = ? OR band1 = ? OR band2 = ? OR band3 = ?", bands
+        ).fetchall()
+        best = min(((bin((h & ((1 << 64) - 1)) ^ value).count("1"), h) for (h,) in rows), default=None)
+        return best[1] if best and best[0] <= GRAPH_HASH_DISTANCE else signed
+    
+    def visit(self, value: int, app: str) -> int:
+        node = self.resolve(value)
+        bands = hash_bands(node & ((1 << 64) - 1))
+        self.db.execute(
+            "INSERT INTO nodes (hash, band0, band1, band2, band3, app, visits, last_seen) VALUES (?, ?, ?, ?, ?, ?, 1, ?) "
+            "ON CONFLICT(hash) DO UPDATE SET visits = visits + 1, last_seen = excluded.last_seen",
+            (node, *bands, app, time.time())
+        )
+        self.db.commit()
+        return node
+    
+    def record_edge(self, src: int, dst: int, tool: str, label: str, args: str, ok: bool, latency: float) -> None:
+        self.db.execute(
+            "INSERT INTO edges (src, dst, tool, label, args, attempts, successes, latency_total) VALUES (?, ?, ?, ?, ?, 1, ?, ?) "
+            "ON CONFLICT(src, tool, label, dst) DO UPDATE SET attempts = attempts + 1, "
+            "successes = successes + excluded.successes, latency_total = latency_total + excluded.latency_total, args = excluded.args",
+            (src, dst, tool, label, args, int(ok), latency)
+        )
+        self.db.commit()
+    
+    def record_goal(self, task: str, node: int) -> None:
+        self.db.execute(
+            "INSERT INTO goals (task, hash, count) VALUES (?, ?, 1) ON CONFLICT(task, hash) DO UPDATE SET count = count + 1",
+            (mission_key(task), node)
+        )
+        self.db.commit()
+    
+    def edges_from(self, src: int) -> List[Tuple]:
+        return self.db.execute(
+            "SELECT dst, tool, label, args, attempts, successes FROM edges "
+            "WHERE src = ? AND dst != src AND successes > 0 ORDER BY successes DESC, attempts ASC",
+            (src,)
+        ).fetchall()
+    
+    def route(self, src: int, task: str) -> List[Tuple]:
+        """Shortest known action sequence (edge rows) from src to a completion frame of this task."""
+        goals = {h for (h,) in self.db.execute("SELECT hash FROM goals WHERE task = ?", (mission_key(task),))}
+        if not goals or src in goals:
+            return []
+        parents: Dict[int, Tuple[int, Tuple]] = {}
+        frontier = [src]
+        seen = {src}
+        for _ in range(GRAPH_ROUTE_MAX_DEPTH):
+            next_frontier = []
+            for node in frontier:
+                for edge in self.edges_from(node):
+                    dst = edge[0]
+                    if dst in seen:
+                        continue
+                    seen.add(dst)
+                    parents[dst] = (node, edge)
+                    if dst in goals:
+                        path = []
+                        while dst != src:
+                            dst, edge = parents[dst]
+                            path.append(edge)
+                        return path[::-1]
+                    next_frontier.append(dst)
+            frontier = next_frontier
+            if not frontier:
+                break
+        return []
+
+def mission_key(task: str) -> str:
+    return " ".join(task.lower().split())
+
+def format_edge(edge: Tuple) -> str:
+    _, tool, label, _, attempts, successes = edge
+    return f"{tool}({label[:25]}) ✓{successes}/{attempts}"
+
+def route_hint(graph: StateGraph, node: int, task: str) -> Tuple[str, Optional[Tuple]]:
+    """Hint text for the prompt plus the first confident route step (for autopilot), if any."""
+    path = graph.route(node, task)
+    if path:
+        first = path[0]
+        confident = first[5] >= GRAPH_AUTOPILOT_MIN_SUCCESS and first[5] / first[4] >= GRAPH_AUTOPILOT_MIN_RATE
+        return "KNOWN ROUTE: " + " → ".join(format_edge(e) for e in path), first if confident else None
+    edges = graph.edges_from(node)[:3]
+    if edges:
+        return "KNOWN FROM HERE: " + "; ".join(format_edge(e) for e in edges), None
+    return "", None
+
+# ============================================================================
+# FRAME STORE
+# ============================================================================
+
+DELTA_MAGIC = b"XD1"
+
+class FrameStore:
+    """
+    Content-addressed screenshot blobs named by the SHA-256 of the frame's PNG.
+    Identical frames are written once; with FRAME_DELTA_ENCODING a frame may be
+    stored as zlib(XOR against a base frame) in a .xd blob. Per-mission JSONL
+    manifests map turns to frame digests.
+    """
+    
+    def __init__(self, root: str = FRAME_STORE_DIR, manifest_dir: str = MANIFEST_DIR):
+        self.root = root
+        self.manifest_dir = manifest_dir
+    
+    def blob_path(self, digest: str, ext: str) -> str:
+        return os.path.join(self.root, digest[:2], f"{digest}.{ext}")
+    
+    def find_blob(self, digest: str) -> Optional[str]:
+        for ext in ("png", "xd"):
+            path = self.blob_path(digest, ext)
+            if os.path.exists(path):
+                return path
+        return None
+    
+    def put(self, png: bytes, rgb: Optional[bytes] = None, w: int = 0, h: int = 0,
+            base: Optional[Tuple[str, bytes, int]] = None) -> Tuple[str, str, int]:
+        """Store a frame; returns (digest, blob path, delta chain length)."""
+        digest = hashlib.sha256(png).hexdigest()
+        existing = self.find_blob(digest)
+        if existing:
+            header = self.delta_header(existing)
+            return digest, existing, header[1] if header else 0
+        
+        path, blob, chain = self.blob_path(digest, "png"), png, 0
+        if base and rgb is not None and len(base[1]) == len(rgb) and base[2] < FRAME_DELTA_MAX_CHAIN:
+            delta = zlib.compress(xor_bytes(rgb, base[1]), 6)
+            header = DELTA_MAGIC + base[0].encode("ascii") + struct.pack("!IIB", w, h, base[2] + 1)
+            if len(header) + len(delta) < len(png):
+                path, blob, chain = self.blob_path(digest, "xd"), header + delta, base[2] + 1
+        
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(blob)
+        os.replace(tmp, path)
+        return digest, path, chain
+    
+    def delta_header(self, path: str) -> Optional[Tuple[str, int]]:
+        """(base digest, chain length) of a delta blob; None for keyframes."""
+        if not path.endswith(".xd"):
+            return None
+        with open(path, "rb") as f:
+            head = f.read(76)
+        if head[:3] != DELTA_MAGIC:
+            return None
+        return head[3:67].decode("ascii"), head[75]
+    
+    def load_rgb(self, digest: str) -> Tuple[bytes, int, int]:
+        path = self.find_blob(digest)
+        if not path:
+            raise FileNotFoundError(f"frame {digest} not in store")
+        with open(path, "rb") as f:
+            blob = f.read()
+        if path.endswith(".png"):
+            return png_to_rgb(blob)
+        base_digest = blob[3:67].decode("ascii")
+        w, h, _ = struct.unpack("!IIB", blob[67:76])
+        base_rgb, _, _ = self.load_rgb(base_digest)
+        return xor_bytes(zlib.decompress(blob[76:]), base_rgb), w, h
+    
+    def load_png(self, digest: str) -> bytes:
+        path = self.find_blob(digest)
+        if path and path.endswith(".png"):
+            with open(path, "rb") as f:
+                return f.read()
+        rgb, w, h = self.load_rgb(digest)
+        return rgb_to_png(rgb, w, h)
+    
+    def manifest_path(self, mission_id: str) -> str:
+        return os.path.join(self.manifest_dir, f"{mission_id}.jsonl")
+    
+    def append_manifest(self, mission_id: str, record: Dict[str, Any]) -> None:
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        with open(self.manifest_path(mission_id), "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    
+    def iter_manifest(self, mission_id: str):
+        with open(self.manifest_path(mission_id), encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    
+    def missions(self) -> List[str]:
+        if not os.path.isdir(self.manifest_dir):
+            return []
+        return sorted(name[:-6] for name in os.listdir(self.manifest_dir) if name.endswith(".jsonl"))
+    
+    def export(self, mission_id: str, out_dir: str) -> int:
+        """Write the legacy screen_NNNN.png view of a mission."""
+        os.makedirs(out_dir, exist_ok=True)
+        count = 0
+        for record in self.iter_manifest(mission_id):
+            if "frame" not in record:
+                continue
+            with open(os.path.join(out_dir, f"{DUMP_PREFIX}{record['turn']:04d}.png"), "wb") as f:
+                f.write(self.load_png(record["frame"]))
+            count += 1
+        return count
+    
+    def gc(self, dry_run: bool = False) -> Tuple[int, int]:
+        """Delete blobs no manifest references (directly or as a delta base). Returns (blobs, bytes)."""
+        live = set()
+        for mission_id in self.missions():
+            for record in self.iter_manifest(mission_id):
+                digest = record.get("frame")
+                while digest and digest not in live:
+                    live.add(digest)
+                    path = self.find_blob(digest)
+                    header = self.delta_header(path) if path else None
+                    digest = header[0] if header else None
+        
+        removed = freed = 0
+        if not os.path.isdir(self.root):
+            return removed, freed
+        for prefix in os.listdir(self.root):
+            folder = os.path.join(self.root, prefix)
+            for name in os.listdir(folder):
+                if name.split(".")[0] in live and not name.endswith(".tmp"):
+                    continue
+                path = os.path.join(folder, name)
+                removed += 1
+                freed += os.path.getsize(path)
+                if not dry_run:
+                    os.remove(path)
+            if not dry_run and not os.listdir(folder):
+                os.rmdir(folder)
+        return removed, freed
+
+FRAME_STORE = FrameStore()
+
+def store_frame(state: AgentState, png: bytes, rgb: bytes, turn: int) -> str:
+    """Persist a turn's frame (frame store or legacy dump) and return its path."""
+    if not ENABLE_FRAME_STORE:
+        return save_screenshot(png, turn)
+    base = state.frame_base if FRAME_DELTA_ENCODING else None
+    digest, path, chain = FRAME_STORE.put(png, rgb, AGENT_IMAGE_W, AGENT_IMAGE_H, base)
+    state.frame_base = (digest, rgb, chain)
+    record: Dict[str, Any] = {"turn": turn, "frame": digest}
+    if turn == 0:
+        record["task"] = state.task
+    FRAME_STORE.append_manifest(state.mission_id, record)
+    return path
+
+# ============================================================================
+# TOOL ARGUMENT PARSING
+# ============================================================================
+
+TOOL_SCHEMAS = {t["function"]["name"]: t["function"]["parameters"] for t in EXECUTOR_TOOLS + TACTICIAN_TOOLS}
+CLOSERS = {"{": "}", "[": "]"}
+
+# Outcome counts for every tool-call argument string parsed this run
+ARG_REPAIR_STATS = {"clean": 0, "repaired": 0, "salvaged": 0, "failed": 0}
+KEYSTROKE_ARGS = {"type_text": ("text",), "press_key": ("key",)}  # Sent as keystrokes: refused if the string was cut off
+
+class ToolArgumentParser:
+    """
+    Repairing JSON scanner for tool-call arguments, fed whole or as streamed deltas.
+    Tracks string/bracket state incrementally so snapshot() only closes what is open:
+    unterminated strings and containers are closed, trailing commas dropped, and
+    partial tokens rolled back to the last complete value.
+    """
+    
+    def __init__(self, tool_name: str = ""):
+        self.tool_name = tool_name
+        self.raw: List[str] = []
+        self.out: List[str] = []
+        self.stack: List[str] = []
+        self.in_string = False
+        self.escape = False
+        self.started = False
+        self.done = False
+        self.safe_len = 0
+        self.safe_stack: Tuple[str, ...] = ()
+    
+    def feed(self, delta: str) -> None:
+        self.raw.append(delta)
+        out, stack = self.out, self.stack
+        for ch in delta:
+            if self.done:
+                break
+            if not self.started:
+                if ch in CLOSERS:
+                    self.started = True
+                    out.append(ch)
+                    stack.append(ch)
+                    self._mark_safe()
+                continue
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                elif ch == "\n":
+                    ch = "\\n"
+                out.append(ch)
+            elif ch == '"':
+                self.in_string = True
+                out.append(ch)
+            elif ch in CLOSERS:
+                out.append(ch)
+                stack.append(ch)
+                self._mark_safe()
+            elif ch in "}]":
+                self._strip_trailing_comma()
+                while stack:
+                    opener = stack.pop()
+                    out.append(CLOSERS[opener])
+                    if CLOSERS[opener] == ch:
+                        break
+                if not stack:
+                    self.done = True
+            elif ch == ",":
+                self._mark_safe()
+                out.append(ch)
+            else:
+                out.append(ch)
+    
+    def _mark_safe(self) -> None:
+        self.safe_len = len(self.out)
+        self.safe_stack = tuple(self.stack)
+    
+    def _strip_trailing_comma(self) -> None:
+        i = len(self.out) - 1
+        while i >= 0 and self.out[i].isspace():
+            i -= 1
+        if i >= 0 and self.out[i] == ",":
+            del self.out[i]
+    
+    def repaired_text(self) -> Optional[str]:
+        """Best-effort valid JSON for everything fed so far (state is not modified)."""
+        if not self.started:
+            return None
+        if self.done:
+            return "".join(self.out)
+        
+        text = "".join(self.out)
+        tail = text.rstrip()[-1:]
+        if not self.in_string and tail and tail not in ',:[]{}"':
+            # A number or literal with no terminator yet may still be growing ("30" of "300")
+            return self.rolled_back_text()
+        if self.in_string:
+            if self.escape:
+                text = text[:-1]
+            text = re.sub(r"\\u[0-9a-fA-F]{0,3}$", "", text) + '"'
+        text = text.rstrip()
+        if text.endswith(","):
+            text = text[:-1]
+        closed = text + "".join(CLOSERS[c] for c in reversed(self.stack))
+        try:
+            json.loads(closed)
+            return closed
+        except json.JSONDecodeError:
+            return self.rolled_back_text()
+    
+    def rolled_back_text(self) -> str:
+        """Everything up to the last complete value, closed from there."""
+        text = "".join(self.out[:self.safe_len]).rstrip().rstrip(",")
+        return text + "".join(CLOSERS[c] for c in reversed(self.safe_stack))
+    
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        text = self.repaired_text()
+        if text is None:
+            return None
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        return value if isinstance(value, dict) else None
+    
+    def salvage(self) -> Dict[str, Any]:
+        """Schema-guided regex extraction of known fields from the raw text."""
+        raw = "".join(self.raw)
+        props = TOOL_SCHEMAS.get(self.tool_name, {}).get("properties", {})
+        found: Dict[str, Any] = {}
+        for name, spec in props.items():
+            key = rf"""["']?{re.escape(name)}["']?\s*[:=]\s*"""
+            if spec.get("type") == "array":
+                m = re.search(key + r"\[([^\]]*)(\]?)", raw)
+                if not m:
+                    continue
+                items = m.group(1)
+                if not m.group(2):
+                    # Unclosed array: the element after the last comma may be cut off
+                    items = items[:items.rfind(",") + 1]
+                if spec.get("items", {}).get("type") == "number":
+                    found[name] = [float(n) for n in re.findall(r"-?\d+(?:\.\d+)?", items)]
+                else:
+                    found[name] = re.findall(r"""["']([^"']*)["']""", items)
+            else:
+                m = re.search(key + r"""(["'])((?:\\.|(?!\1).)*)""", raw, re.S)
+                if not m:
+                    continue
+                try:
+                    found[name] = json.loads('"' + m.group(2).replace("\n", "\\n") + '"')
+                except json.JSONDecodeError:
+                    found[name] = m.group(2)
+        return found
+    
+    def result(self) -> Optional[Dict[str, Any]]:
+        """Final arguments with ARG_REPAIR_STATS accounting; None if nothing usable."""
+        raw = "".join(self.raw)
+        try:
+            value = json.loads(raw)
+            if isinstance(value, dict):
+                ARG_REPAIR_STATS["clean"] += 1
+                return value
+        except json.JSONDecodeError:
+            pass
+        
+        args = self.complete_fields(self.snapshot() or {})
+        required = TOOL_SCHEMAS.get(self.tool_name, {}).get("required", [])
+        missing = [name for name in required if name not in args]
+        salvaged = False
+        if missing:
+            extra = {k: v for k, v in self.complete_fields(self.salvage()).items() if k not in args}
+            args.update(extra)
+            salvaged = bool(extra)
+            missing = [name for name in required if name not in args]
+        cut = [name for name in KEYSTROKE_ARGS.get(self.tool_name, ()) if name in args and not self.closed_string(name)]
+        if cut:
+            print(f"⚠️ Refusing {self.tool_name}: {', '.join(cut)} was cut off mid-string")
+            ARG_REPAIR_STATS["failed"] += 1
+            return None
+        if args and not missing:
+            ARG_REPAIR_STATS["salvaged" if salvaged else "repaired"] += 1
+            return args
+        ARG_REPAIR_STATS["failed"] += 1
+        return None
+    
+    def closed_string(self, name: str) -> bool:
+        """Whether the raw text holds a string value for name with its closing quote."""
+        key = rf"""[{{,]\s*["']?{re.escape(name)}["']?\s*[:=]\s*"""
+        return re.search(key + r"""(["'])(?:\\.|(?!\1).)*\1""", "".join(self.raw), re.S) is not None
+    
+    def complete_fields(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Drop repaired arrays shorter than the schema's minItems (e.g. a position missing a coordinate)."""
+        props = TOOL_SCHEMAS.get(self.tool_name, {}).get("properties", {})
+        return {k: v for k, v in args.items()
+                if not (isinstance(v, list) and len(v) < props.get(k, {}).get("minItems", 0))}
+
+def parse_tool_arguments(tool_name: str, raw: Any) -> Optional[Dict[str, Any]]:
+    """Parse tool-call arguments, repairing truncated or malformed JSON where possible."""
+    if isinstance(raw, dict):
+        ARG_REPAIR_STATS["clean"] += 1
+        return raw
+    parser = ToolArgumentParser(tool_name)
+    parser.feed(str(raw or ""))
+    return parser.result()
+
+# ============================================================================
+# ADAPTIVE TIMING
+# ============================================================================
+
+class TimingProfiles:
+    """Observed post-action settle times per (application, tool), persisted as JSON."""
+    
+    def __init__(self, path: str = TIMING_PROFILE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.profiles: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.loaded = False
+        self.dirty = False
+        self.last_settled: Optional[float] = None
+    
+    def load(self) -> None:
+        if self.loaded:
+            return
+        self.loaded = True
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self.profiles = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Timing profiles unreadable, starting cold: {e}")
+    
+    def save(self) -> None:
+        with self.lock:
+            if not self.dirty:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self.profiles, f)
+            self.dirty = False
+    
+    def stats(self, app: str, tool: str) -> Optional[Dict[str, Any]]:
+        self.load()
+        return self.profiles.get(app, {}).get(tool)
+    
+    def wait_for(self, app: str, tool: str) -> float:
+        """Learned p95 settle time (never below the tool's TIMING_MIN_WAIT), or TIMING_UI_RENDER until enough samples exist."""
+        stats = self.stats(app, tool)
+        if not stats or stats["n"] < TIMING_MIN_SAMPLES:
+            return TIMING_UI_RENDER
+        return max(stats["p95"], TIMING_MIN_WAIT.get(tool, TIMING_MIN_WAIT_DEFAULT))
+    
+    def record(self, app: str, tool: str, seconds: float) -> None:
+        self.load()
+        with self.lock:
+            stats = self.profiles.setdefault(app, {}).setdefault(tool, {"n": 0, "ewma": seconds, "p95": seconds, "samples": []})
+            stats["n"] += 1
+            stats["ewma"] = round(stats["ewma"] + TIMING_EWMA_ALPHA * (seconds - stats["ewma"]), 3)
+            samples = (stats["samples"] + [round(seconds, 3)])[-TIMING_WINDOW:]
+            stats["samples"] = samples
+            ordered = sorted(samples)
+            stats["p95"] = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            self.dirty = True
+
+TIMINGS = TimingProfiles()
+
+def wait_for_stable_frame(app: str, tool: str) -> None:
+    """
+    Wait out the post-action render. Waits at least the learned p95 for (app, tool),
+    polling small captures to measure when the screen actually stopped changing;
+    keeps polling past the p95 (up to TIMING_MAX_RENDER) while it is still changing.
+    The measured time-to-stable becomes a new sample, unless no change was seen at
+    all: that says nothing about how long the UI takes to react, and recording it
+    as 0 s would drag the p95 down until the wait stops covering real renders.
+    """
+    TIMINGS.last_settled = None
+    if not ADAPTIVE_TIMING:
+        time.sleep(TIMING_UI_RENDER)
+        return
+    wait = TIMINGS.wait_for(app, tool)
+    start = time.perf_counter()
+    last_sig = b""
+    last_change = 0.0
+    changed = False
+    stable_polls = 0
+    while True:
+        rgb, _, _ = capture_frame(TIMING_PROBE_W, TIMING_PROBE_H)
+        elapsed = time.perf_counter() - start
+        sig = frame_signature(rgb, TIMING_PROBE_W, TIMING_PROBE_H)
+        if last_sig and frame_change(last_sig, sig) > TIMING_STABLE_CHANGE:
+            last_change, stable_polls, changed = elapsed, 0, True
+        elif last_sig:
+            stable_polls += 1
+        last_sig = sig
+        settled = stable_polls >= TIMING_STABLE_POLLS
+        if (settled and elapsed >= wait) or elapsed >= TIMING_MAX_RENDER:
+            break
+        time.sleep(TIMING_POLL_INTERVAL)
+    if changed or not settled:
+        TIMINGS.record(app, tool, last_change if settled else TIMING_MAX_RENDER)
+    TIMINGS.last_settled = last_change if settled else None
 
 # ============================================================================
 # TOOL EXECUTION
 # ============================================================================
 
-def execute_tool_action(name: str, args: Dict[str, Any], sw: int, sh: int) -> str:
-    """Execute single tool without screenshot capture."""
+def execute_tool_action(name: str, args: Dict[str, Any], sw: int, sh: int, app: str = "unknown") -> str:
+    """Execute single tool without screenshot capture, then wait for the UI to settle."""
     
     if name in CLICK_TOOLS_MAP:
         label = args.get("label", "")
@@ -780,7 +2420,7 @@ def execute_tool_action(name: str, args: Dict[str, Any], sw: int, sh: int) -> st
         time.sleep(TIMING_CURSOR_SETTLE)
         action_func, action_name = CLICK_TOOLS_MAP[name]
         action_func()
-        time.sleep(TIMING_UI_RENDER)
+        wait_for_stable_frame(app, name)
         return f"{action_name}: {label}"
     
     elif name == "drag_element":
@@ -793,7 +2433,7 @@ def execute_tool_action(name: str, args: Dict[str, Any], sw: int, sh: int) -> st
         sx, sy = norm_to_px(float(start[0]), float(start[1]), sw, sh)
         ex, ey = norm_to_px(float(end[0]), float(end[1]), sw, sh)
         drag(sx, sy, ex, ey)
-        time.sleep(TIMING_UI_RENDER)
+        wait_for_stable_frame(app, name)
         return f"Dragged {label}"
     
     elif name == "type_text":
@@ -801,7 +2441,7 @@ def execute_tool_action(name: str, args: Dict[str, Any], sw: int, sh: int) -> st
         if not text:
             return "Error: text required"
         type_text(text)
-        time.sleep(TIMING_UI_RENDER)
+        wait_for_stable_frame(app, name)
         return f"Typed: {text[:50]}"
     
     elif name == "press_key":
@@ -815,26 +2455,243 @@ def execute_tool_action(name: str, args: Dict[str, Any], sw: int, sh: int) -> st
                 return f"Error: Unknown key '{part}'"
         
         press_key(key)
-        time.sleep(TIMING_UI_RENDER)
+        wait_for_stable_frame(app, name)
         return f"Pressed: {key}"
     
     elif name == "scroll_down":
         move_mouse(sw // 2, sh // 2)
         time.sleep(TIMING_CURSOR_SETTLE)
         scroll_action(-1)
-        time.sleep(TIMING_UI_RENDER)
+        wait_for_stable_frame(app, name)
         return "Scrolled down"
     
     elif name == "scroll_up":
         move_mouse(sw // 2, sh // 2)
         time.sleep(TIMING_CURSOR_SETTLE)
         scroll_action(1)
-        time.sleep(TIMING_UI_RENDER)
+        wait_for_stable_frame(app, name)
         return "Scrolled up"
     
     else:
         return f"Error: unknown tool '{name}'"
 
+# ============================================================================
+# CONTACT SHEET
+# ============================================================================
+
+# 3x5 glyphs, one string of 0/1 per row
+GLYPHS = {
+    "0": ("111", "101", "101", "101", "111"), "1": ("010", "110", "010", "010", "111"),
+    "2": ("111", "001", "111", "100", "111"), "3": ("111", "001", "111", "001", "111"),
+    "4": ("101", "101", "111", "001", "001"), "5": ("111", "100", "111", "001", "111"),
+    "6": ("111", "100", "111", "101", "111"), "7": ("111", "001", "010", "010", "010"),
+    "8": ("111", "101", "111", "101", "111"), "9": ("111", "101", "111", "001", "111"),
+    "T": ("111", "010", "010", "010", "010"),
+}
+SHEET_LABEL_BG = b"\x00\x00\x00"
+SHEET_LABEL_FG = b"\xff\xff\x00"
+SHEET_BORDER = b"\x40\x40\x40"
+SHEET_OK = b"\x00\xff\x00"
+SHEET_FAILED = b"\xff\x00\x00"
+
+def fill_rect(buf: bytearray, w: int, h: int, x0: int, y0: int, x1: int, y1: int, color: bytes) -> None:
+    """Fill [x0, x1) x [y0, y1) of a packed RGB buffer, clipped to the image."""
+    x0, x1 = max(0, x0), min(w, x1)
+    y0, y1 = max(0, y0), min(h, y1)
+    if x0 >= x1:
+        return
+    span = color * (x1 - x0)
+    for y in range(y0, y1):
+        buf[(y * w + x0) * 3:(y * w + x1) * 3] = span
+
+def draw_text(buf: bytearray, w: int, h: int, x: int, y: int, text: str, scale: int = 2) -> None:
+    """Draw GLYPHS text on a dark box with its top-left corner at (x, y)."""
+    advance = 4 * scale
+    fill_rect(buf, w, h, x, y, x + advance * len(text) + scale, y + 7 * scale, SHEET_LABEL_BG)
+    for i, ch in enumerate(text):
+        gx = x + scale + i * advance
+        for row, bits in enumerate(GLYPHS.get(ch, ())):
+            for col, bit in enumerate(bits):
+                if bit == "1":
+                    px, py = gx + col * scale, y + scale + row * scale
+                    fill_rect(buf, w, h, px, py, px + scale, py + scale, SHEET_LABEL_FG)
+
+def paste_downscaled(sheet: bytearray, sw: int, rgb: bytes, w: int, h: int, factor: int, x0: int, y0: int) -> None:
+    """Subsample rgb by factor into sheet at (x0, y0): one strided slice copy per channel per row."""
+    tw = w // factor
+    step = 3 * factor
+    for ty in range(h // factor):
+        src = (ty * factor) * w * 3
+        row = src + tw * step
+        dst = ((y0 + ty) * sw + x0) * 3
+        end = dst + tw * 3
+        sheet[dst:end:3] = rgb[src:row:step]
+        sheet[dst + 1:end:3] = rgb[src + 1:row:step]
+        sheet[dst + 2:end:3] = rgb[src + 2:row:step]
+
+def draw_marker(buf: bytearray, w: int, h: int, x: int, y: int, color: bytes) -> None:
+    arm = CONTACT_SHEET_MARKER
+    fill_rect(buf, w, h, x - arm, y, x + arm + 1, y + 1, color)
+    fill_rect(buf, w, h, x, y - arm, x + 1, y + arm + 1, color)
+
+def compose_contact_sheet(state: AgentState) -> Optional[Tuple[bytes, int, int, List[int]]]:
+    """
+    Tile the frames of the turns before this one (oldest top-left) into one RGB image
+    of AGENT_IMAGE_W width. Each tile carries its turn number and a crosshair at the
+    action point (green ok, red error). Returns (rgb, w, h, turns) or None if fewer than two frames.
+    """
+    frames = [(turn, rgb) for turn, rgb in state.recent_frames
+              if turn < state.turn and len(rgb) == AGENT_IMAGE_W * AGENT_IMAGE_H * 3][-CONTACT_SHEET_FRAMES:]
+    if len(frames) < 2:
+        return None
+    cols = CONTACT_SHEET_COLS
+    tw, th = AGENT_IMAGE_W // cols, AGENT_IMAGE_H // cols
+    w, h = tw * cols, th * ((len(frames) + cols - 1) // cols)
+    sheet = bytearray(w * h * 3)
+    actions = {record.turn: record for record in state.history.recent(CONTACT_SHEET_FRAMES + 1)}
+    
+    for i, (turn, rgb) in enumerate(frames):
+        x0, y0 = (i % cols) * tw, (i // cols) * th
+        paste_downscaled(sheet, w, rgb, AGENT_IMAGE_W, AGENT_IMAGE_H, cols, x0, y0)
+        record = actions.get(turn)
+        if record is not None and record.x >= 0:
+            mx = x0 + min(tw - 1, record.x * tw // 1000)
+            my = y0 + min(th - 1, record.y * th // 1000)
+            draw_marker(sheet, w, h, mx, my, SHEET_FAILED if record.failed else SHEET_OK)
+        fill_rect(sheet, w, h, x0, y0, x0 + tw, y0 + 1, SHEET_BORDER)
+        fill_rect(sheet, w, h, x0, y0, x0 + 1, y0 + th, SHEET_BORDER)
+        draw_text(sheet, w, h, x0 + 1, y0 + 1, f"T{turn}")
+    return bytes(sheet), w, h, [turn for turn, _ in frames]
+
+# ============================================================================
+# CHANGE REGIONS
+# ============================================================================
+
+# Two quantizations offset by half a step: a pixel only counts as changed when it moves
+# to another level in both, which needs a delta of at least 8 (always at 16 or more)
+QUANT_LO = bytes(i >> 4 for i in range(256))
+QUANT_HI = bytes(min(255, i + 8) >> 4 for i in range(256))
+NONZERO = bytes([0] + [1] * 255)
+CHANGE_COLOR = b"\xff\x00\xff"
+
+def quantize_frame(rgb: bytes) -> Tuple[bytes, bytes]:
+    return rgb.translate(QUANT_LO), rgb.translate(QUANT_HI)
+
+def differing(a: bytes, b: bytes) -> int:
+    """Big int with a 1 in each byte lane where a and b differ."""
+    n = len(a)
+    return int.from_bytes((int.from_bytes(a, "big") ^ int.from_bytes(b, "big")).to_bytes(n, "big").translate(NONZERO), "big")
+
+def changed_blocks(prev: Tuple[bytes, bytes], cur: Tuple[bytes, bytes], w: int, h: int) -> List[List[bool]]:
+    """
+    CHANGE_BLOCK grid of blocks holding a sample that changed in both quantizations.
+    Identical scanlines are skipped by a plain compare; the rest get a per-sample mask
+    that is only then split into blocks.
+    """
+    (lo_a, hi_a), (lo_b, hi_b) = prev, cur
+    cols, rows = w // CHANGE_BLOCK, h // CHANGE_BLOCK
+    stride, span = w * 3, CHANGE_BLOCK * 3
+    clean = bytes(span)
+    grid = [[False] * cols for _ in range(rows)]
+    for y in range(rows * CHANGE_BLOCK):
+        row = grid[y // CHANGE_BLOCK]
+        start = y * stride
+        end = start + stride
+        if all(row) or lo_a[start:end] == lo_b[start:end] or hi_a[start:end] == hi_b[start:end]:
+            continue
+        both = differing(lo_a[start:end], lo_b[start:end]) & differing(hi_a[start:end], hi_b[start:end])
+        if not both:
+            continue
+        mask = both.to_bytes(stride, "big")
+        for bx in range(cols):
+            if not row[bx] and mask[bx * span:(bx + 1) * span] != clean:
+                row[bx] = True
+    return grid
+
+def mask_cursor(grid: List[List[bool]], screen_dims: Tuple[int, int], *points: Optional[Tuple[int, int]]) -> None:
+    """Clear the blocks within CHANGE_CURSOR_SIZE screen pixels of each cursor position."""
+    sw, sh = screen_dims
+    rows, cols = len(grid), len(grid[0]) if grid else 0
+    if not sw or not sh:
+        return
+    for point in points:
+        if point is None:
+            continue
+        x0 = max(0, int((point[0] - CHANGE_CURSOR_SIZE) * AGENT_IMAGE_W / sw) // CHANGE_BLOCK)
+        x1 = min(cols - 1, int((point[0] + CHANGE_CURSOR_SIZE) * AGENT_IMAGE_W / sw) // CHANGE_BLOCK)
+        y0 = max(0, int((point[1] - CHANGE_CURSOR_SIZE) * AGENT_IMAGE_H / sh) // CHANGE_BLOCK)
+        y1 = min(rows - 1, int((point[1] + CHANGE_CURSOR_SIZE) * AGENT_IMAGE_H / sh) // CHANGE_BLOCK)
+        for by in range(y0, y1 + 1):
+            for bx in range(x0, x1 + 1):
+                grid[by][bx] = False
+
+def block_regions(grid: List[List[bool]]) -> List[Tuple[int, int, int, int]]:
+    """Bounding boxes (x0, y0, x1, y1 in blocks, exclusive) of 8-connected changed blocks, largest first."""
+    rows, cols = len(grid), len(grid[0]) if grid else 0
+    seen = [[False] * cols for _ in range(rows)]
+    boxes = []
+    for y in range(rows):
+        for x in range(cols):
+            if not grid[y][x] or seen[y][x]:
+                continue
+            seen[y][x] = True
+            stack = [(x, y)]
+            x0, y0, x1, y1 = x, y, x, y
+            while stack:
+                cx, cy = stack.pop()
+                x0, y0, x1, y1 = min(x0, cx), min(y0, cy), max(x1, cx), max(y1, cy)
+                for ny in range(max(0, cy - 1), min(rows, cy + 2)):
+                    for nx in range(max(0, cx - 1), min(cols, cx + 2)):
+                        if grid[ny][nx] and not seen[ny][nx]:
+                            seen[ny][nx] = True
+                            stack.append((nx, ny))
+            boxes.append((x0, y0, x1 + 1, y1 + 1))
+    boxes.sort(key=lambda b: (b[2] - b[0]) * (b[3] - b[1]), reverse=True)
+    return boxes
+
+def describe_change(grid: List[List[bool]], boxes: List[Tuple[int, int, int, int]]) -> str:
+    """History note in 0-1000 coordinates, e.g. "changed [300,200]-[700,600]"."""
+    rows, cols = len(grid), len(grid[0]) if grid else 0
+    changed = sum(map(sum, grid))
+    if not changed:
+        return "no visible change"
+    if changed > CHANGE_FULL_FRACTION * rows * cols:
+        return "whole screen changed"
+    spans = [f"[{x0 * 1000 // cols},{y0 * 1000 // rows}]-[{x1 * 1000 // cols},{y1 * 1000 // rows}]"
+             for x0, y0, x1, y1 in boxes[:CHANGE_MAX_REGIONS]]
+    more = f" +{len(boxes) - CHANGE_MAX_REGIONS} more" if len(boxes) > CHANGE_MAX_REGIONS else ""
+    return "changed " + ", ".join(spans) + more
+
+def annotate_change(state: AgentState, rgb: bytes) -> Optional[bytes]:
+    """
+    Diff this turn's frame against the previous one and note the changed regions on the
+    previous turn's action. Returns an outlined copy of the frame when CHANGE_OVERLAY is set.
+    """
+    cur = quantize_frame(rgb)
+    prev, state.frame_quant = state.frame_quant, cur
+    # Nothing moves the mouse between a capture and this stage, so this is where it was drawn
+    prev_cursor, state.cursor_pos = state.cursor_pos, get_cursor_pos()
+    last = state.history.last()
+    if prev is None or last is None or last.turn != state.turn - 1 or len(prev[0]) != len(rgb):
+        return None
+    grid = changed_blocks(prev, cur, AGENT_IMAGE_W, AGENT_IMAGE_H)
+    mask_cursor(grid, state.screen_dims, prev_cursor, state.cursor_pos)
+    boxes = block_regions(grid)
+    change = describe_change(grid, boxes)
+    state.history.annotate_last(change)
+    print(f"Δ {change}")
+    if not CHANGE_OVERLAY or not boxes or change == "whole screen changed":
+        return None
+    out = bytearray(rgb)
+    w, h = AGENT_IMAGE_W, AGENT_IMAGE_H
+    for x0, y0, x1, y1 in boxes[:CHANGE_MAX_REGIONS]:
+        x0, y0, x1, y1 = x0 * CHANGE_BLOCK, y0 * CHANGE_BLOCK, x1 * CHANGE_BLOCK, y1 * CHANGE_BLOCK
+        fill_rect(out, w, h, x0, y0, x1, y0 + 1, CHANGE_COLOR)
+        fill_rect(out, w, h, x0, y1 - 1, x1, y1, CHANGE_COLOR)
+        fill_rect(out, w, h, x0, y0, x0 + 1, y1, CHANGE_COLOR)
+        fill_rect(out, w, h, x1 - 1, y0, x1, y1, CHANGE_COLOR)
+    return bytes(out)
+
 # ============================================================================
 # PERSONA INVOCATIONS
 # ============================================================================
@@ -855,8 +2712,9 @@ def invoke_strategist(task: str, screenshot: bytes) -> str:
             ],
             "temperature": 0.3,
             "max_tokens": 1200
-        })
+        }, persona="strategist")
         
+        record_usage("strategist", resp)
         return resp["choices"][0]["message"].get("content", "").strip()
     except Exception as e:
         return f"Strategist invocation failed: {e}"
@@ -866,12 +2724,23 @@ def invoke_tactician(state: AgentState) -> Tuple[Optional[str], Optional[str], O
     Call Field Commander for oversight and phase management.
     Returns: (executor_prompt, phase_name, tool_names) or (None, None, None) if no update.
     """
-    b64 = base64.b64encode(state.screenshot).decode("ascii")
-    history_text = build_history_text(state)
+    b64 = state.get_image_b64("tactician")
+    history_text = build_history_text(state, "tactician")
+    images = []
+    sheet = compose_contact_sheet(state) if ENABLE_CONTACT_SHEET else None
+    if sheet:
+        rgb, w, h, turns = sheet
+        png = encode_image(rgb, w, h, image_mode_for("tactician", state.current_phase))
+        images.append(base64.b64encode(png).decode("ascii"))
+        screens = (f"RECENT FRAMES: [first image] turns T{turns[0]}-T{turns[-1]} before each action, oldest top-left; "
+                   f"crosshair = action point (green ok, red error)\nCURRENT SCREENSHOT: [last image]")
+    else:
+        screens = "CURRENT SCREENSHOT: [below]"
+    images.append(b64)
     
     prompt = f"""{history_text}
 
-CURRENT SCREENSHOT: [below]
+{screens}
 
 ASSESSMENT REQUIRED:
 1. Current phase status (complete/in-progress/blocked)
@@ -889,17 +2758,16 @@ REMEMBER: Include 'report_completion' in tools ONLY during verification phase.""
             "model": LMSTUDIO_MODEL,
             "messages": [
                 {"role": "system", "content": state.tactician_prompt},
-                {"role": "user", "content": [
-                    {"type": "text", "text": prompt},
-                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{b64}"}}
+                {"role": "user", "content": [{"type": "text", "text": prompt}] + [
+                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image}"}} for image in images
                 ]}
             ],
-            "tools": TACTICIAN_TOOLS,
             "tool_choice": "auto",
             "temperature": 0.4,
             "max_tokens": 800
-        })
+        }, TACTICIAN_TOOLS_JSON, persona="tactician", budget=state.budget)
         
+        record_usage("tactician", resp)
         msg = resp["choices"][0]["message"]
         tool_calls = msg.get("tool_calls")
         
@@ -915,9 +2783,8 @@ REMEMBER: Include 'report_completion' in tools ONLY during verification phase.""
         
         for tc in tool_calls:
             tool_name = tc["function"]["name"]
-            try:
-                tool_args = json.loads(tc["function"]["arguments"])
-            except json.JSONDecodeError:
+            tool_args = parse_tool_arguments(tool_name, tc["function"].get("arguments"))
+            if tool_args is None:
                 continue
             
             if tool_name == "spawn_executor_prompt":
@@ -945,12 +2812,13 @@ def invoke_executor(state: AgentState) -> Optional[Dict]:
         print("⚠️ No executor prompt available - waiting for tactician")
         return None
     
-    executor_tools = state.get_executor_tools()
-    if not executor_tools:
+    tool_names = state.get_executor_tool_names()
+    if not tool_names:
         print("⚠️ No tools available - using fallback")
-        executor_tools = EXECUTOR_TOOLS
+        tool_names = tuple(TOOL_REGISTRY)
+    tools_json = encode_tools(tool_names, ENABLE_COMPACT_TOOLS)
     
-    b64 = base64.b64encode(state.screenshot).decode("ascii")
+    b64 = state.get_image_b64("executor")
     history_text = build_history_text(state)
     
     prompt = f"""{history_text}
@@ -959,26 +2827,33 @@ CURRENT SCREENSHOT: [below]
 
 EXECUTE: ONE precise action based on current phase goals.
 Output single tool call with detailed justification (50+ words)."""
+    if ENABLE_COMPACT_TOOLS:
+        prompt += f"\nEvery tool's 'justification': {JUSTIFICATION_DESC}."
     
     is_looping = detect_terminal_loop(state)
     temperature = LMSTUDIO_TEMPERATURE * 1.5 if is_looping else LMSTUDIO_TEMPERATURE
     
+    payload = {
+        "model": LMSTUDIO_MODEL,
+        "messages": [
+            {"role": "system", "content": state.current_executor_prompt},
+            {"role": "user", "content": [
+                {"type": "text", "text": prompt},
+                {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{b64}"}}
+            ]}
+        ],
+        "tool_choice": "auto",
+        "temperature": temperature,
+        "max_tokens": LMSTUDIO_MAX_TOKENS
+    }
+    
+    if EXECUTOR_SAMPLES > 1:
+        return sample_executor(payload, tools_json, EXECUTOR_SAMPLES, state.budget)
+    
     try:
-        resp = post_json({
-            "model": LMSTUDIO_MODEL,
-            "messages": [
-                {"role": "system", "content": state.current_executor_prompt},
-                {"role": "user", "content": [
-                    {"type": "text", "text": prompt},
-                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{b64}"}}
-                ]}
-            ],
-            "tools": executor_tools,
-            "tool_choice": "auto",
-            "temperature": temperature,
-            "max_tokens": LMSTUDIO_MAX_TOKENS
-        })
+        resp = post_json(payload, tools_json, persona="executor", budget=state.budget)
         
+        record_usage("executor", resp)
         msg = resp["choices"][0]["message"]
         tool_calls = msg.get("tool_calls")
         
@@ -993,125 +2868,872 @@ Output single tool call with detailed justification (50+ words)."""
         print(f"Executor call failed: {e}")
         return None
 
+def sample_executor(payload: Dict[str, Any], tools_json: bytes, n: int,
+                    budget: Optional[MissionBudget] = None) -> Optional[Dict]:
+    """Request n executor candidates in parallel and return the majority tool call."""
+    messages: List[Dict] = []
+    if EXECUTOR_SAMPLING_USE_N:
+        try:
+            resp = post_json(dict(payload, n=n), tools_json, persona="executor", budget=budget)
+            record_usage("executor", resp)
+            messages = [c["message"] for c in resp["choices"]]
+        except Exception as e:
+            print(f"Executor call failed: {e}")
+    else:
+        def one_sample(_):
+            try:
+                resp = post_json(payload, tools_json, persona="executor", budget=budget)
+                record_usage("executor", resp)
+                return resp["choices"][0]["message"]
+            except Exception as e:
+                print(f"Executor sample failed: {e}")
+                return None
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            messages = [m for m in pool.map(one_sample, range(n)) if m]
+    
+    candidates = [m["tool_calls"][0] for m in messages if m.get("tool_calls")]
+    if not candidates:
+        print(f"Executor returned no tool calls in {len(messages)} samples")
+        return None
+    return vote_tool_calls(candidates)
+
+def candidate_args(tool_call: Dict) -> Dict[str, Any]:
+    """Parsed arguments of a candidate (repaired where possible, empty if unreadable)."""
+    parser = ToolArgumentParser(tool_call["function"]["name"])
+    parser.feed(str(tool_call["function"].get("arguments") or ""))
+    return parser.snapshot() or {}
+
+def vote_value(name: str, value: Any) -> Any:
+    """Hashable, normalized form of one argument for comparing candidates."""
+    if isinstance(value, str):
+        value = " ".join(value.split())
+        return value.lower() if name in EXECUTOR_VOTE_CASELESS_ARGS else value
+    if isinstance(value, (list, tuple)):
+        return tuple(vote_value(name, v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, vote_value(k, v)) for k, v in value.items()))
+    return value
+
+def vote_key(tool_call: Dict, args: Dict[str, Any], point: Optional[Tuple[float, float]]) -> Tuple:
+    """
+    What candidates must share to be in one cluster: tool and label for positional
+    calls (which then also cluster by distance), tool and every non-reasoning
+    argument otherwise.
+    """
+    name = tool_call["function"]["name"]
+    if point is not None:
+        return (name, vote_value("label", args.get("label", "")))
+    return (name,) + tuple(sorted((k, vote_value(k, v)) for k, v in args.items()
+                                  if k not in EXECUTOR_VOTE_IGNORED_ARGS))
+
+def vote_tool_calls(candidates: List[Dict]) -> Dict:
+    """
+    Cluster candidates by vote_key and, for positional calls, coordinate proximity
+    (EXECUTOR_VOTE_RADIUS), then return the member nearest the centroid of the
+    largest cluster.
+    """
+    clusters: List[Dict[str, Any]] = []
+    for tc in candidates:
+        name = tc["function"]["name"]
+        args = candidate_args(tc)
+        point = coerce_point(args.get("position") or args.get("start"))
+        key = vote_key(tc, args, point)
+        for cluster in clusters:
+            if cluster["key"] != key:
+                continue
+            centroid = cluster["centroid"]
+            if point is None or \
+                    ((point[0] - centroid[0]) ** 2 + (point[1] - centroid[1]) ** 2) ** 0.5 <= EXECUTOR_VOTE_RADIUS:
+                cluster["members"].append((tc, point))
+                points = [p for _, p in cluster["members"] if p is not None]
+                if points:
+                    cluster["centroid"] = (sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points))
+                break
+        else:
+            clusters.append({"tool": name, "key": key, "centroid": point, "members": [(tc, point)]})
+    
+    best = max(clusters, key=lambda c: len(c["members"]))
+    centroid = best["centroid"]
+    if centroid is None:
+        winner = best["members"][0][0]
+    else:
+        winner = min(best["members"], key=lambda m: float("inf") if m[1] is None else
+                     (m[1][0] - centroid[0]) ** 2 + (m[1][1] - centroid[1]) ** 2)[0]
+    print(f"Vote: {best['tool']} {len(best['members'])}/{len(candidates)} candidates agree ({len(clusters)} clusters)")
+    return winner
+
+# ============================================================================
+# PROMPT CACHE WARMING
+# ============================================================================
+
+def warm_prefix(persona: str, system: str, text: str = "", tools_json: Optional[bytes] = None) -> Optional[float]:
+    """Prefill a persona's stable prefix (max_tokens=1) so its next real call hits the server's prompt cache."""
+    messages = [{"role": "system", "content": system}]
+    if text:
+        messages.append({"role": "user", "content": text})
+    start = time.perf_counter()
+    try:
+        post_json({"model": LMSTUDIO_MODEL, "messages": messages, "temperature": 0, "max_tokens": 1}, tools_json,
+                  persona=f"{persona}_warmup", retries=0)
+    except Exception:
+        return None
+    seconds = time.perf_counter() - start
+    METRICS.observe("agent_warmup_seconds", seconds, persona=persona)
+    return seconds
+
+def warm_requests(state: Optional[AgentState], task: str = "") -> List[Tuple[str, str, str, Optional[bytes]]]:
+    """Prefixes the next real calls start with: (persona, system prompt, leading user text, tools).
+    Without a state this is the strategist call that follows STARTUP_DELAY. Mid-mission it is the
+    tactician when staleness will force oversight next turn, and the executor when a tactician
+    call has just displaced its prefix from the cache."""
+    if state is None:
+        return [("strategist", STRATEGIST_PROMPT, f"Mission: {task}", None)]
+    requests = []
+    if state.tactician_prompt and state.turn + 1 - state.last_tactician_turn >= TACTICIAN_MAX_STALENESS:
+        requests.append(("tactician", state.tactician_prompt, context_prefix(state, "tactician"), TACTICIAN_TOOLS_JSON))
+    if state.current_executor_prompt and (requests or state.last_tactician_turn == state.turn):
+        tools_json = encode_tools(state.get_executor_tool_names() or tuple(TOOL_REGISTRY), ENABLE_COMPACT_TOOLS)
+        requests.append(("executor", state.current_executor_prompt, context_prefix(state, "executor"), tools_json))
+    return requests
+
+def warm_prefixes(requests: List[Tuple[str, str, str, Optional[bytes]]], results: Dict[str, float]) -> None:
+    for persona, system, text, tools_json in requests:
+        seconds = warm_prefix(persona, system, text, tools_json)
+        if seconds is not None:
+            results[persona] = seconds
+
+def start_warmup(requests: List[Tuple[str, str, str, Optional[bytes]]], results: Dict[str, float]) -> Optional[threading.Thread]:
+    """Warm in a daemon thread while the caller sleeps; None when disabled or nothing to warm."""
+    if not PROMPT_WARMUP or not requests:
+        return None
+    thread = threading.Thread(target=warm_prefixes, args=(requests, results), name="warmup", daemon=True)
+    thread.start()
+    return thread
+
 # ============================================================================
 # MAIN AGENT LOOP
 # ============================================================================
 
-def run_agent(state: AgentState) -> str:
-    """Three-body hierarchy execution loop."""
+async def run_stage(state: AgentState, name: str, func, *args):
+    """Run a blocking stage in a worker thread, recording its wall time."""
+    import asyncio
+    if name in ("tactician", "executor") and name not in state.first_call_warmed:
+        state.first_call_warmed[name] = name in state.warm_done
+    start = time.perf_counter()
+    try:
+        return await asyncio.to_thread(func, *args)
+    finally:
+        state.record_stage(name, time.perf_counter() - start)
+
+def capture_stage() -> Tuple[bytes, bytes, int, int]:
+    rgb, sw, sh = capture_frame(AGENT_IMAGE_W, AGENT_IMAGE_H)
+    return rgb, rgb_to_png(rgb, AGENT_IMAGE_W, AGENT_IMAGE_H), sw, sh
+
+def encode_stage(rgb: bytes, png: bytes) -> Tuple[str, bytes, bytes]:
+    gray = rgb_to_gray(rgb)
+    return base64.b64encode(png).decode("ascii"), frame_signature(rgb, AGENT_IMAGE_W, AGENT_IMAGE_H), gray
+
+async def settle_and_prefetch(state: AgentState, delay: float) -> Tuple[bytes, bytes, int, int]:
+    """Sleep out the post-action settle, starting the next capture so it lands as the settle ends."""
+    import asyncio
+    recent = state.stage_timings.get("capture", [])[-5:]
+    lead = min(delay, sum(recent) / len(recent)) if recent else 0.0
+    if delay >= WARMUP_MIN_IDLE:
+        requests = warm_requests(state)
+        if start_warmup(requests, state.warm_done):
+            for persona, _, _, _ in requests:
+                state.warmups[persona] = state.warmups.get(persona, 0) + 1
+    await asyncio.sleep(delay - lead)
+    return await run_stage(state, "capture", capture_stage)
+
+def apply_tactician_result(state: AgentState, result: Tuple[Optional[str], Optional[str], Optional[List[str]]]) -> None:
+    executor_prompt, phase_name, tool_names = result
+    if executor_prompt and phase_name and tool_names:
+        print(f"\n✓ Phase Transition: {state.current_phase} → {phase_name}")
+        print(f"✓ Executor reconfigured with {len(tool_names)} tools")
+        state.update_executor_context(executor_prompt, phase_name, tool_names)
+    elif state.turn == 1:
+        # Fallback: Use default config if tactician fails on first turn
+        print("⚠️ Tactician tool calls missing - using fallback executor config")
+        METRICS.inc("agent_fallbacks_total")
+        state.update_executor_context(
+            EXECUTOR_FALLBACK_PROMPT,
+            "FALLBACK",
+            ["click_element", "press_key", "type_text", "scroll_down", "scroll_up"]
+        )
+
+async def run_executor_turn(state: AgentState, tool_call: Optional[Dict], sw: int, sh: int,
+                            write_task: "asyncio.Task[str]") -> Optional[str]:
+    """Parse and execute the executor's tool call. Returns a completion status or None to continue."""
+    if not tool_call:
+        state.executor_missed = True
+        print("⚠️ No action taken this turn")
+        return None
+    
+    tool_name = tool_call["function"]["name"]
+    
+    tool_args = parse_tool_arguments(tool_name, tool_call["function"].get("arguments"))
+    if tool_args is None:
+        state.executor_missed = True
+        METRICS.inc("agent_errors_total", kind="parse")
+        print(f"✗ Argument parse error: {str(tool_call['function'].get('arguments'))[:80]}")
+        return None
+    
+    justification = tool_args.get("justification", "")
+    
+    # Completion check
+    if tool_name == "report_completion":
+        evidence = tool_args.get("evidence", "")
+        if len(evidence.strip()) < 100:
+            print(f"✗ Insufficient completion evidence")
+            return None
+        
+        print(f"\n{'='*70}")
+        print("MISSION COMPLETE")
+        print(f"{'='*70}")
+        print(f"Evidence: {evidence}")
+        print(f"{'='*70}\n")
+        if state.graph_node is not None:
+            get_state_graph().record_goal(state.task, state.graph_node)
+        return f"Completed in {state.turn} turns"
+    
+    # Execute action
+    print(f"\nAction: {tool_name}")
+    print(f"Target: {tool_args.get('label', tool_args.get('text', tool_args.get('key', ''))[:30])}")
+    
+    is_click = tool_name in CLICK_TOOLS_MAP and ENABLE_TARGET_CACHE
+    if is_click:
+        snap_click_target(state, tool_args)
+    
+    TIMINGS.last_settled = None
+    result = await run_stage(state, "action", execute_tool_action, tool_name, tool_args, sw, sh, state.foreground_app)
+    latency = state.turn_stages.get("action", 0.0)
+    if TIMINGS.last_settled is not None:
+        # The action already waited for a stable frame; only a short gap before the next capture
+        state.settle_delay = TIMING_INTER_ACTION
+    
+    if state.graph_node is not None:
+        state.pending_edge = (state.graph_node, tool_name, str(tool_args.get("label", tool_args.get("text", tool_args.get("key", ""))))[:60],
+                              json.dumps(tool_args), not result.startswith("Error:"), latency)
+    
+    METRICS.observe("agent_action_seconds", latency, tool=tool_name)
+    if result.startswith("Error:"):
+        METRICS.inc("agent_errors_total", kind="tool")
+        print(f"✗ {result}")
+    else:
+        print(f"✓ {result}")
+        if is_click:
+            remember_click_target(state, tool_args)
+    
+    # Record history (frame path is known once the background write lands)
+    path = await write_task
+    state.add_history(
+        tool=tool_name,
+        args=tool_args,
+        justification=justification,
+        result=result,
+        screenshot_path=path,
+        latency=latency
+    )
+    return None
+
+STATE_GRAPH: Optional[StateGraph] = None
+
+def get_state_graph() -> StateGraph:
+    global STATE_GRAPH
+    if STATE_GRAPH is None:
+        STATE_GRAPH = StateGraph()
+    return STATE_GRAPH
+
+def update_state_graph(state: AgentState) -> None:
+    """Resolve this frame's node, close the previous turn's edge, and refresh the route hint."""
+    graph = get_state_graph()
+    node = graph.visit(perceptual_hash(state.frame_gray, AGENT_IMAGE_W, AGENT_IMAGE_H), state.foreground_app)
+    if state.pending_edge:
+        src, tool, label, args, ok, latency = state.pending_edge
+        # An action that left the screen unchanged did not succeed as a transition
+        graph.record_edge(src, node, tool, label, args, ok and node != src, latency)
+        state.pending_edge = None
+    state.graph_node = node
+    state.route_hint, state.autopilot_step = route_hint(graph, node, state.task)
+
+def format_stages(stages: Dict[str, float]) -> str:
+    return " | ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in stages.items())
+
+async def run_agent_async(state: AgentState) -> str:
+    """
+    Pipelined turn loop. Disk writes overlap inference, the next capture overlaps
+    the post-action settle, and healthy oversight turns run tactician and executor
+    concurrently. Actions and history updates stay strictly in turn order.
+    """
+    import asyncio
+    frame = None
     
     for iteration in range(MAX_STEPS):
+        if state.budget.expired():
+            print(f"\n⚠️ Mission time budget spent ({MISSION_TIME_BUDGET:.0f}s)")
+            return f"Deadline reached ({state.turn} turns)"
         state.increment_turn()
+        state.turn_stages = {}
+        state.settle_delay = TIMING_TURN_DELAY
+        turn_start = time.perf_counter()
+        METRICS.inc("agent_turns_total")
+        METRICS.set("agent_turn", state.turn)
         
-        # Capture fresh screenshot
-        png, sw, sh = capture_png(AGENT_IMAGE_W, AGENT_IMAGE_H)
-        screenshot_path = save_screenshot(png, state.turn)
-        state.update_screenshot(png)
+        # Capture fresh screenshot (prefetched during the previous settle)
+        if frame is None:
+            frame = await run_stage(state, "capture", capture_stage)
+        rgb, png, sw, sh = frame
+        frame = None
+        b64, frame_sig, state.frame_gray = await run_stage(state, "encode", encode_stage, rgb, png)
+        state.foreground_app = get_foreground_app()
+        overlay = await run_stage(state, "diff", annotate_change, state, rgb) if ENABLE_CHANGE_REGIONS else None
+        write_task = asyncio.create_task(run_stage(state, "write", store_frame, state, png, rgb, state.turn))
+        METRICS.set("agent_queue_depth", 1, queue="writes")
+        if overlay:
+            # Models see the outlined frame; the frame store keeps the raw capture
+            rgb, png = overlay, rgb_to_png(overlay, AGENT_IMAGE_W, AGENT_IMAGE_H)
+            b64 = base64.b64encode(png).decode("ascii")
+        state.update_screenshot(png, frame_sig, b64, rgb)
+        if ENABLE_STATE_GRAPH:
+            update_state_graph(state)
         
         print(f"\n{'='*70}")
         print(f"TURN {state.turn} | Phase: {state.current_phase}")
         print(f"{'='*70}")
         
-        # TACTICIAN OVERSIGHT (turn 1 and every N turns)
-        if state.turn == 1 or state.turn % TACTICIAN_INTERVAL == 0:
-            print(f"\n[TACTICIAN] Field Commander oversight...")
-            
-            executor_prompt, phase_name, tool_names = invoke_tactician(state)
-            
-            if executor_prompt and phase_name and tool_names:
-                print(f"\n✓ Phase Transition: {state.current_phase} → {phase_name}")
-                print(f"✓ Executor reconfigured with {len(tool_names)} tools")
-                state.update_executor_context(executor_prompt, phase_name, tool_names)
-            elif state.turn == 1:
-                # Fallback: Use default config if tactician fails on first turn
-                print("⚠️ Tactician tool calls missing - using fallback executor config")
-                state.update_executor_context(
-                    EXECUTOR_FALLBACK_PROMPT,
-                    "FALLBACK",
-                    ["click_element", "press_key", "type_text", "scroll_down", "scroll_up"]
-                )
-            
-            time.sleep(TIMING_TURN_DELAY)
-        
-        # EXECUTOR ACTION (every turn after tactician initializes)
-        if state.current_executor_prompt:
-            print(f"\n[EXECUTOR] Operative action...")
-            
-            tool_call = invoke_executor(state)
-            
-            if not tool_call:
-                print("⚠️ No action taken this turn")
-                time.sleep(TIMING_TURN_DELAY)
-                continue
-            
-            tool_name = tool_call["function"]["name"]
-            
-            try:
-                tool_args = json.loads(tool_call["function"]["arguments"])
-            except json.JSONDecodeError as e:
-                print(f"✗ Argument parse error: {e}")
-                time.sleep(TIMING_TURN_DELAY)
-                continue
-            
-            justification = tool_args.get("justification", "")
-            
-            # Completion check
-            if tool_name == "report_completion":
-                evidence = tool_args.get("evidence", "")
-                if len(evidence.strip()) < 100:
-                    print(f"✗ Insufficient completion evidence")
-                    time.sleep(TIMING_TURN_DELAY)
-                    continue
+        try:
+            # TACTICIAN OVERSIGHT (event-driven)
+            tool_call = None
+            executor_done = False
+            if detect_terminal_loop(state):
+                METRICS.inc("agent_loops_total")
+                state.loop_turns += 1
+            trigger = tactician_trigger(state)
+            if trigger:
+                state.tactician_calls += 1
+                print(f"\n[TACTICIAN] Field Commander oversight ({trigger})...")
                 
-                print(f"\n{'='*70}")
-                print("MISSION COMPLETE")
-                print(f"{'='*70}")
-                print(f"Evidence: {evidence}")
-                print(f"{'='*70}\n")
-                return f"Completed in {state.turn} turns"
-            
-            # Execute action
-            print(f"\nAction: {tool_name}")
-            print(f"Target: {tool_args.get('label', tool_args.get('text', tool_args.get('key', ''))[:30])}")
-            
-            result = execute_tool_action(tool_name, tool_args, sw, sh)
+                if state.current_executor_prompt and trigger.startswith(CONCURRENT_OVERSIGHT_TRIGGERS):
+                    print(f"[EXECUTOR] Operative action (concurrent, previous config)...")
+                    result, tool_call = await asyncio.gather(
+                        run_stage(state, "tactician", invoke_tactician, state),
+                        run_stage(state, "executor", invoke_executor, state)
+                    )
+                    executor_done = True
+                else:
+                    result = await run_stage(state, "tactician", invoke_tactician, state)
+                
+                state.last_tactician_turn = state.turn
+                state.error_streak = 0
+                state.executor_missed = False
+                apply_tactician_result(state, result)
             
-            if result.startswith("Error:"):
-                print(f"✗ {result}")
+            # EXECUTOR ACTION (every turn after tactician initializes)
+            if state.current_executor_prompt:
+                if not executor_done and GRAPH_AUTOPILOT and state.autopilot_step:
+                    _, tool, label, args, attempts, successes = state.autopilot_step
+                    print(f"\n[AUTOPILOT] Known route step: {tool}({label}) ✓{successes}/{attempts}")
+                    tool_call = {"function": {"name": tool, "arguments": args}}
+                elif not executor_done:
+                    print(f"\n[EXECUTOR] Operative action...")
+                    tool_call = await run_stage(state, "executor", invoke_executor, state)
+                
+                completed = await run_executor_turn(state, tool_call, sw, sh, write_task)
+                if completed:
+                    return completed
             else:
-                print(f"✓ {result}")
-            
-            # Record history
-            state.add_history(
-                tool=tool_name,
-                args=tool_args,
-                justification=justification,
-                result=result,
-                screenshot_path=screenshot_path
-            )
-            
-            # Prune history
-            state.history = prune_history(state.history, MAX_HISTORY_ITEMS)
-        else:
-            print("⚠️ Waiting for tactician initialization...")
+                print("⚠️ Waiting for tactician initialization...")
+        finally:
+            await write_task
+            METRICS.set("agent_queue_depth", 0, queue="writes")
+            METRICS.observe("agent_turn_seconds", time.perf_counter() - turn_start)
         
-        time.sleep(TIMING_TURN_DELAY)
+        print(f"Stages: {format_stages(state.turn_stages)}")
+        frame = await settle_and_prefetch(state, state.settle_delay)
     
     return f"Max iterations reached ({MAX_STEPS} turns)"
 
+def run_agent(state: AgentState) -> str:
+    """Three-body hierarchy execution loop."""
+    import asyncio
+    status = "Failed"
+    try:
+        status = asyncio.run(run_agent_async(state))
+        return status
+    except KeyboardInterrupt:
+        status = "Aborted"
+        raise
+    finally:
+        if ENABLE_MISSION_ARCHIVE:
+            save_mission_archive(state, status)
+        if ADAPTIVE_TIMING:
+            TIMINGS.save()
+
+def first_call_seconds(state: AgentState) -> Dict[str, float]:
+    """Latency of each persona's first call this mission (the one a cold prompt cache hurts most)."""
+    first = {name: round(v[0], 3) for name, v in state.stage_timings.items() if name in ("tactician", "executor") and v}
+    if state.strategist_seconds:
+        first["strategist"] = round(state.strategist_seconds, 3)
+    return first
+
+def save_mission_archive(state: AgentState, status: str) -> str:
+    """Write the mission summary and action log read by `python main.py analyze`."""
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(ARCHIVE_DIR, f"{state.mission_id}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "mission_id": state.mission_id,
+            "task": state.task,
+            "status": status,
+            "started": round(state.started, 3),
+            "ended": round(time.time(), 3),
+            "turns": state.turn,
+            "final_phase": state.current_phase,
+            "phase_log": [(turn, phase, round(at, 3)) for turn, phase, at in state.phase_log],
+            "tactician_calls": state.tactician_calls,
+            "reconfigurations": state.reconfigurations,
+            "loop_turns": state.loop_turns,
+            "time_budget_s": MISSION_TIME_BUDGET,
+            "request_failures": state.budget.failures,
+            "prompt_warmup": PROMPT_WARMUP,
+            "warmups": state.warmups,
+            "first_call_s": first_call_seconds(state),
+            "first_call_warmed": state.first_call_warmed,
+            "stage_ms": {name: [round(t * 1000, 1) for t in v] for name, v in state.stage_timings.items()},
+            "actions": list(state.history.archive_dicts()),
+        }, f)
+    return path
+
 # ============================================================================
 # MAIN ENTRY
 # ============================================================================
 
+def cli_frames(args: "argparse.Namespace") -> int:
+    store = FrameStore()
+    if args.frames_command == "list":
+        for mission_id in store.missions():
+            records = list(store.iter_manifest(mission_id))
+            task = next((r["task"] for r in records if "task" in r), "")
+            print(f"{mission_id}  {len(records):4d} frames  {task[:60]}")
+    elif args.frames_command == "export":
+        out_dir = args.out or os.path.join(DUMP_DIR, args.mission)
+        count = store.export(args.mission, out_dir)
+        print(f"Exported {count} frames to {out_dir}")
+    elif args.frames_command == "gc":
+        removed, freed = store.gc(dry_run=args.dry_run)
+        verb = "Would remove" if args.dry_run else "Removed"
+        print(f"{verb} {removed} unreferenced blobs ({freed / 1024:.1f} KB)")
+    return 0
+
+def synthetic_frame(w: int, h: int) -> bytes:
+    """Desktop-like test frame: gradient wallpaper, window chrome, text-like stripes."""
+    rgb = bytearray(w * h * 3)
+    for y in range(h):
+        row = bytes(c for x in range(w) for c in (30 + x * 60 // w, 60 + y * 80 // h, 120))
+        rgb[y * w * 3:(y + 1) * w * 3] = row
+    for x0, y0, x1, y1 in ((w // 8, h // 8, w * 5 // 8, h * 7 // 8), (w // 2, h // 4, w * 15 // 16, h * 3 // 4)):
+        for y in range(y0, y1):
+            line = bytearray(b"\xf0\xf0\xf0" * (x1 - x0))
+            if y < y0 + 8:
+                line = bytearray(b"\x2b\x57\x9a" * (x1 - x0))
+            elif (y - y0) % 6 < 2:
+                for x in range(4, x1 - x0 - 4, 3):
+                    if (x * 7 + y * 3) % 11 < 6:
+                        line[x * 3:x * 3 + 3] = b"\x20\x20\x20"
+            rgb[(y * w + x0) * 3:(y * w + x1) * 3] = line
+    return bytes(rgb)
+
+def load_bench_frames(paths: List[str]) -> List[Tuple[str, bytes, int, int]]:
+    if not paths:
+        return [("synthetic", synthetic_frame(AGENT_IMAGE_W, AGENT_IMAGE_H), AGENT_IMAGE_W, AGENT_IMAGE_H)]
+    frames = []
+    for path in paths:
+        with open(path, "rb") as f:
+            frames.append((os.path.basename(path),) + png_to_rgb(f.read()))
+    return frames
+
+def cli_bench_image(args: "argparse.Namespace") -> int:
+    """Size and encode latency per image mode; optionally server round-trip latency."""
+    modes = ["rgb", "gray", "gray4", "palette"]
+    for name, rgb, w, h in load_bench_frames(args.frames):
+        print(f"\n{name} ({w}x{h})")
+        print(f"  {'mode':<8} {'png KB':>8} {'b64 KB':>8} {'encode ms':>10}" + (f" {'server ms':>10}" if args.server else ""))
+        for mode in modes:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                png = encode_image(rgb, w, h, mode)
+            encode_ms = (time.perf_counter() - start) * 1000 / args.repeat
+            b64 = base64.b64encode(png).decode("ascii")
+            line = f"  {mode:<8} {len(png) / 1024:8.1f} {len(b64) / 1024:8.1f} {encode_ms:10.1f}"
+            if args.server:
+                start = time.perf_counter()
+                post_json({
+                    "model": LMSTUDIO_MODEL,
+                    "messages": [{"role": "user", "content": [
+                        {"type": "text", "text": "Describe the screen in one word."},
+                        {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{b64}"}}
+                    ]}],
+                    "max_tokens": 1
+                })
+                line += f" {(time.perf_counter() - start) * 1000:10.0f}"
+            print(line)
+    return 0
+
+def measure_import(module: str = "main") -> Tuple[float, List[Tuple[float, str]], List[str]]:
+    """Import module in a fresh interpreter under -X importtime.
+    Returns (total ms, [(cumulative ms, name)] slowest first, deferred modules that got loaded)."""
+    import subprocess
+    probe = f"import sys, {module}; print(','.join(m for m in {DEFERRED_IMPORTS!r} if m in sys.modules))"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], capture_output=True, text=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    entries = []
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                entries.append((int(cumulative) / 1000, name.rstrip()))
+    total = next((ms for ms, name in entries if name.strip() == module), 0.0)
+    entries.sort(reverse=True)
+    return total, entries, [m for m in proc.stdout.strip().split(",") if m]
+
+def cli_bench_warmup(args: "argparse.Namespace") -> int:
+    """First-call latency per persona with a cold vs a warmed prompt prefix.
+    A random nonce heads each system prompt so no run can reuse an earlier run's cache."""
+    import uuid
+    rgb = synthetic_frame(AGENT_IMAGE_W, AGENT_IMAGE_H)
+    b64 = base64.b64encode(encode_image(rgb, AGENT_IMAGE_W, AGENT_IMAGE_H, "rgb")).decode("ascii")
+    doctrine = "1. MISSION RESTATEMENT\n" + args.task
+    personas = [
+        ("strategist", STRATEGIST_PROMPT, f"Mission: {args.task}", None),
+        ("tactician", TACTICIAN_PROMPT_TEMPLATE.format(mission=args.task, doctrine=doctrine),
+         f"MISSION: {args.task}\n", TACTICIAN_TOOLS_JSON),
+        ("executor", EXECUTOR_FALLBACK_PROMPT, f"MISSION: {args.task}\n",
+         encode_tools(tuple(TOOL_REGISTRY), ENABLE_COMPACT_TOOLS)),
+    ]
+    
+    def first_call(system: str, text: str, tools_json: Optional[bytes]) -> float:
+        start = time.perf_counter()
+        post_json({
+            "model": LMSTUDIO_MODEL,
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": [
+                    {"type": "text", "text": text + "\nCURRENT SCREENSHOT: [below]"},
+                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{b64}"}}
+                ]}
+            ],
+            "temperature": 0,
+            "max_tokens": 1
+        }, tools_json)
+        return time.perf_counter() - start
+    
+    print(f"{'persona':<11} {'cold ms':>9} {'warm ms':>9} {'saved':>7} {'warmup ms':>10}  ({args.runs} runs)")
+    for persona, system, text, tools_json in personas:
+        cold, warm, cost = [], [], []
+        for _ in range(args.runs):
+            cold.append(first_call(f"[{uuid.uuid4()}]\n{system}", text, tools_json))
+            fresh = f"[{uuid.uuid4()}]\n{system}"
+            warmup = warm_prefix(persona, fresh, text, tools_json)
+            if warmup is None:
+                return 1
+            cost.append(warmup)
+            warm.append(first_call(fresh, text, tools_json))
+        cold_ms, warm_ms = sum(cold) * 1000 / len(cold), sum(warm) * 1000 / len(warm)
+        print(f"{persona:<11} {cold_ms:9.0f} {warm_ms:9.0f} {(1 - warm_ms / cold_ms) * 100:6.0f}% {sum(cost) * 1000 / len(cost):10.0f}")
+    return 0
+
+def cli_bench_import(args: "argparse.Namespace") -> int:
+    """Import time of main.py against IMPORT_TIME_BUDGET_MS; fails if a deferred import is loaded eagerly."""
+    measure_import(args.module)  # warm the bytecode cache
+    runs = [measure_import(args.module) for _ in range(max(1, args.runs))]
+    totals = sorted(total for total, _, _ in runs)
+    median = totals[len(totals) // 2]
+    _, entries, leaked = min(runs, key=lambda run: run[0])
+    
+    print(f"import {args.module}: median {median:.1f}ms, best {totals[0]:.1f}ms over {len(totals)} runs (budget {args.budget}ms)")
+    for ms, name in entries[:args.top]:
+        print(f"  {ms:8.1f}ms {name}")
+    ok = True
+    if leaked:
+        print(f"✗ Deferred modules imported eagerly: {', '.join(leaked)}")
+        ok = False
+    if median > args.budget:
+        print(f"✗ Import time over budget by {median - args.budget:.1f}ms")
+        ok = False
+    if ok:
+        print("✓ Import time within budget")
+    return 0 if ok else 1
+
+def cli_analyze(args: "argparse.Namespace") -> int:
+    """Stream mission archives into a trajectory report (JSON, optional per-mission CSV)."""
+    import analytics
+    stats = analytics.analyze(args.paths or [ARCHIVE_DIR], reservoir_size=args.reservoir)
+    report = stats.report()
+    analytics.print_summary(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Report: {args.json}")
+    if args.csv:
+        analytics.write_csv(stats.rows, args.csv)
+        print(f"✓ Missions: {args.csv}")
+    return 0
+
+def cli_timings(args: "argparse.Namespace") -> int:
+    """Learned settle times per application and tool."""
+    TIMINGS.load()
+    if not TIMINGS.profiles:
+        print(f"No timing profiles in {TIMING_PROFILE_PATH} (cold default {TIMING_UI_RENDER}s)")
+        return 0
+    print(f"{'application':<24} {'tool':<18} {'n':>5} {'ewma s':>7} {'p95 s':>7} {'wait s':>7}")
+    for app, tools in sorted(TIMINGS.profiles.items()):
+        if args.app and args.app.lower() not in app:
+            continue
+        for tool, stats in sorted(tools.items()):
+            wait = TIMINGS.wait_for(app, tool)
+            print(f"{app[:24]:<24} {tool:<18} {stats['n']:>5} {stats['ewma']:7.2f} {stats['p95']:7.2f} {wait:7.2f}")
+    return 0
+
+def cli_bench_deflate(args: "argparse.Namespace") -> int:
+    """Parallel deflate scaling across image sizes and thread counts (verified by round-trip)."""
+    cores = os.cpu_count() or 1
+    threads = [int(t) for t in args.threads.split(",")] if args.threads else sorted({1, 2, 4, 8, cores} - {t for t in (2, 4, 8) if t > cores})
+    print(f"{cores} cores, level {args.level}, block {args.block // 1024} KiB")
+    for size in args.sizes.split(","):
+        w, h = (int(v) for v in size.lower().split("x"))
+        rgb = synthetic_frame(w, h)
+        raw = filtered_rows(rgb, w * 3, 0, h)
+        print(f"\n{w}x{h} ({len(raw) / 1e6:.1f} MB raw)")
+        print(f"  {'threads':>7} {'ms':>9} {'speedup':>8} {'KB':>9} {'vs serial':>9}")
+        baseline = serial_size = 0.0
+        for n in threads:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                out = deflate_scanlines(rgb, w * 3, h, args.level, n, args.block) if n > 1 else zlib.compress(raw, args.level)
+            ms = (time.perf_counter() - start) * 1000 / args.repeat
+            if zlib.decompress(out) != raw:
+                print(f"✗ {n} threads: stream does not round-trip")
+                return 1
+            if n == 1:
+                baseline, serial_size = ms, len(out)
+            print(f"  {n:>7} {ms:9.1f} {baseline / ms if baseline else 0:7.2f}x {len(out) / 1024:9.1f} {len(out) / serial_size if serial_size else 0:8.3f}x")
+    return 0
+
+DOCTRINE_CACHE: Dict[str, str] = {}
+DOCTRINE_CACHE_LOCK = threading.Lock()
+
+def load_doctrine_cache(path: str = DOCTRINE_CACHE_PATH) -> None:
+    if not DOCTRINE_CACHE and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            DOCTRINE_CACHE.update(json.load(f))
+
+def plan_mission(task: str, use_cache: bool = True) -> Tuple[str, bool]:
+    """Strategist doctrine for a task, from the doctrine cache when possible. Returns (doctrine, cached)."""
+    key = mission_key(task)
+    if use_cache and key in DOCTRINE_CACHE:
+        return DOCTRINE_CACHE[key], True
+    rgb, _, _ = capture_frame(AGENT_IMAGE_W, AGENT_IMAGE_H)
+    doctrine = invoke_strategist(task, encode_image(rgb, AGENT_IMAGE_W, AGENT_IMAGE_H, image_mode_for("strategist")))
+    if use_cache and not doctrine.startswith("Strategist invocation failed"):
+        with DOCTRINE_CACHE_LOCK:
+            DOCTRINE_CACHE[key] = doctrine
+            os.makedirs(os.path.dirname(DOCTRINE_CACHE_PATH) or ".", exist_ok=True)
+            with open(DOCTRINE_CACHE_PATH, "w", encoding="utf-8") as f:
+                json.dump(DOCTRINE_CACHE, f, indent=2)
+    return doctrine, False
+
+def prefetch_plan(task: str, use_cache: bool = True) -> Optional[Tuple[str, bool]]:
+    """
+    Planning work that is safe ahead of a mission: cached doctrine, or on a miss a warmed
+    strategist prefix. The strategist itself waits for the mission to start, so its recon
+    screenshot is that mission's screen and not the one another mission is driving.
+    """
+    key = mission_key(task)
+    if use_cache and key in DOCTRINE_CACHE:
+        return DOCTRINE_CACHE[key], True
+    if PROMPT_WARMUP:
+        warm_prefixes(warm_requests(None, task), {})
+    return None
+
+def iter_missions(path: str):
+    """Stream (mission id, task) pairs from a JSONL queue; lines may be objects or bare strings."""
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                spec = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"⚠️ Skipping queue line {number}: invalid JSON")
+                continue
+            if isinstance(spec, str):
+                spec = {"task": spec}
+            task = str(spec.get("task") or spec.get("mission") or "").strip()
+            if not task:
+                print(f"⚠️ Skipping queue line {number}: no task")
+                continue
+            yield str(spec.get("id", number)), task
+
+def run_batch_mission(mission_id: str, task: str, doctrine_future, use_cache: bool = True) -> Dict[str, Any]:
+    """Plan, set up and run one queued mission. Any failure becomes this mission's "Failed" record."""
+    record: Dict[str, Any] = {"id": mission_id, "task": task, "started": time.time()}
+    state: Optional[AgentState] = None
+    run_start = time.perf_counter()
+    try:
+        plan_start = time.perf_counter()
+        doctrine, cached = doctrine_future.result() or plan_mission(task, use_cache)
+        record.update({"doctrine_cached": cached, "plan_wait_s": round(time.perf_counter() - plan_start, 3)})
+        
+        rgb, sw, sh = capture_frame(AGENT_IMAGE_W, AGENT_IMAGE_H)
+        png = rgb_to_png(rgb, AGENT_IMAGE_W, AGENT_IMAGE_H)
+        state = AgentState(task, png, (sw, sh))
+        record["mission_id"] = state.mission_id
+        store_frame(state, png, rgb, 0)
+        state.strategist_doctrine = doctrine
+        state.tactician_prompt = TACTICIAN_PROMPT_TEMPLATE.format(mission=task, doctrine=doctrine_for("tactician", doctrine))
+        
+        run_start = time.perf_counter()
+        record["status"] = run_agent(state)
+    except KeyboardInterrupt:
+        record["status"] = "Aborted"
+        raise
+    except Exception as e:
+        record["status"] = "Failed"
+        record["error"] = str(e)
+    finally:
+        stages = state.stage_timings if state else {}
+        record.update({
+            "turns": state.turn if state else 0,
+            "phase": state.current_phase if state else "",
+            "run_s": round(time.perf_counter() - run_start, 3),
+            "stage_mean_ms": {name: round(sum(v) * 1000 / len(v), 1) for name, v in stages.items() if v},
+        })
+    return record
+
+def cli_batch(args: "argparse.Namespace") -> int:
+    """Run queued missions headlessly; desktop execution is serial, doctrine lookup and warm-up run ahead."""
+    from concurrent.futures import ThreadPoolExecutor
+    init_dpi()
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    load_doctrine_cache()
+    print(f"Batch: {args.queue} → {args.out} (concurrency {args.concurrency})")
+    time.sleep(STARTUP_DELAY)  # once per batch, not per mission
+    
+    missions = iter_missions(args.queue)
+    window: "deque[Tuple[str, str, Any]]" = deque()
+    done = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as planner, \
+            open(args.out, "a", encoding="utf-8") as out:
+        def refill(limit: int) -> None:
+            while len(window) < limit:
+                spec = next(missions, None)
+                if spec is None:
+                    return
+                window.append(spec + (planner.submit(prefetch_plan, spec[1], not args.no_cache),))
+        
+        refill(1)
+        while window:
+            mission_id, task, future = window.popleft()
+            # Missions in flight = the running one + up to concurrency-1 being prefetched
+            refill(max(0, args.concurrency - 1))
+            METRICS.set("agent_queue_depth", len(window), queue="missions")
+            print(f"\n{'#'*70}\nMISSION {mission_id}: {task}\n{'#'*70}")
+            
+            record = run_batch_mission(mission_id, task, future, not args.no_cache)
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            done += 1
+            print(f"→ {record['status']} ({record['turns']} turns, {record['run_s']}s)")
+            if not window:
+                refill(1)
+    
+    print(f"\nBatch complete: {done} missions, results in {args.out}")
+    return 0
+
+def run_cli(argv: List[str]) -> int:
+    """Command-line entry: offline tools and headless batch missions."""
+    import argparse
+    parser = argparse.ArgumentParser(prog="main.py", description="Three-body hierarchy agent tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    frames = commands.add_parser("frames", help="Frame store maintenance")
+    frames_commands = frames.add_subparsers(dest="frames_command", required=True)
+    frames_commands.add_parser("list", help="List missions in the frame store")
+    export = frames_commands.add_parser("export", help="Write screen_NNNN.png files for a mission")
+    export.add_argument("mission", help="Mission id (see 'frames list')")
+    export.add_argument("out", nargs="?", help="Output directory (default: dumps/<mission>)")
+    gc = frames_commands.add_parser("gc", help="Delete blobs not referenced by any manifest")
+    gc.add_argument("--dry-run", action="store_true")
+    frames.set_defaults(handler=cli_frames)
+    
+    bench_image = commands.add_parser("bench-image", help="Compare image modes by size and latency")
+    bench_image.add_argument("frames", nargs="*", help="PNG frames to encode (default: synthetic desktop)")
+    bench_image.add_argument("--repeat", type=int, default=5)
+    bench_image.add_argument("--server", action="store_true", help="Also time a max_tokens=1 request per mode")
+    bench_image.set_defaults(handler=cli_bench_image)
+    
+    timings = commands.add_parser("timings", help="Show learned per-app settle times")
+    timings.add_argument("--app", help="Filter by executable name")
+    timings.set_defaults(handler=cli_timings)
+    
+    bench_deflate = commands.add_parser("bench-deflate", help="Parallel PNG deflate scaling benchmark")
+    bench_deflate.add_argument("--sizes", default="512x256,1280x720,1920x1080,2560x1440", help="Comma-separated WxH list")
+    bench_deflate.add_argument("--threads", help="Comma-separated thread counts (default: 1,2,4,8 up to core count)")
+    bench_deflate.add_argument("--level", type=int, default=PNG_COMPRESS_LEVEL)
+    bench_deflate.add_argument("--block", type=int, default=PNG_DEFLATE_BLOCK, help="Uncompressed bytes per block")
+    bench_deflate.add_argument("--repeat", type=int, default=3)
+    bench_deflate.set_defaults(handler=cli_bench_deflate)
+    
+    bench_warmup = commands.add_parser("bench-warmup", help="First-call latency with vs without prompt-cache warming")
+    bench_warmup.add_argument("--task", default="Open Notepad and type hello")
+    bench_warmup.add_argument("--runs", type=int, default=3)
+    bench_warmup.set_defaults(handler=cli_bench_warmup)
+    
+    bench_import = commands.add_parser("bench-import", help="Check import time (-X importtime) against the budget")
+    bench_import.add_argument("--module", default="main")
+    bench_import.add_argument("--runs", type=int, default=5)
+    bench_import.add_argument("--budget", type=float, default=IMPORT_TIME_BUDGET_MS, help="Median import ms allowed")
+    bench_import.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    bench_import.set_defaults(handler=cli_bench_import)
+    
+    analyze = commands.add_parser("analyze", help="Trajectory analytics over mission archives")
+    analyze.add_argument("paths", nargs="*", help=f"Archive files or directories (default: {ARCHIVE_DIR})")
+    analyze.add_argument("--json", help="Write the full report as JSON")
+    analyze.add_argument("--csv", help="Write one row per mission (with outlier flags) as CSV")
+    analyze.add_argument("--reservoir", type=int, default=ANALYTICS_RESERVOIR, help="Samples kept per percentile estimate")
+    analyze.set_defaults(handler=cli_analyze)
+    
+    batch = commands.add_parser("batch", help="Run missions from a JSONL queue headlessly")
+    batch.add_argument("queue", help="JSONL file: {\"id\": ..., \"task\": ...} or a JSON string per line")
+    batch.add_argument("--out", default=BATCH_RESULTS_PATH, help="Per-mission results JSONL (appended)")
+    batch.add_argument("--concurrency", type=int, default=1, help="Missions in flight (cached doctrine and strategist warm-up run ahead; desktop actions stay serial)")
+    batch.add_argument("--no-cache", action="store_true", help="Always call the strategist")
+    batch.set_defaults(handler=cli_batch)
+    
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
 def main() -> None:
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
+    
     init_dpi()
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
     
     print("\n" + "="*70)
     print("THREE-BODY MILITARY HIERARCHY AGENT")
     print("="*70)
     print(f"\nConfiguration:")
     print(f"  Max Steps: {MAX_STEPS}")
-    print(f"  Tactician Interval: {TACTICIAN_INTERVAL} turns")
+    print(f"  Time Budget: {f'{MISSION_TIME_BUDGET:.0f}s' if MISSION_TIME_BUDGET > 0 else 'unlimited'}")
+    print(f"  Tactician Oversight: event-driven (max {TACTICIAN_MAX_STALENESS} turns stale)")
     print(f"  Single Action Mode: Enabled")
     print("="*70 + "\n")
     
@@ -1119,25 +3741,40 @@ def main() -> None:
     if not task:
         sys.exit("Error: Mission required")
 
+    # Strategist prefix is prefilled while we wait
+    warmed: Dict[str, float] = {}
+    warmer = start_warmup(warm_requests(None, task), warmed)
     time.sleep(STARTUP_DELAY) #good to have to prevent the model to see his own logs, close cmd after enter do it
     
     # Capture initial screenshot
-    png, sw, sh = capture_png(AGENT_IMAGE_W, AGENT_IMAGE_H)
-    screenshot_path = save_screenshot(png, 0)
+    rgb, sw, sh = capture_frame(AGENT_IMAGE_W, AGENT_IMAGE_H)
+    png = rgb_to_png(rgb, AGENT_IMAGE_W, AGENT_IMAGE_H)
+    state = AgentState(task, png, (sw, sh))
+    screenshot_path = store_frame(state, png, rgb, 0)
     print(f"Initial recon: {screenshot_path}\n")
+    if warmer:
+        warmer.join()
+        for persona, seconds in warmed.items():
+            state.warmups[persona] = 1
+            state.warm_done[persona] = seconds
+            print(f"✓ Prompt cache warmed: {persona} ({seconds:.2f}s)")
     
     print("="*70)
     print("PHASE 0: STRATEGIC COMMAND")
     print("="*70 + "\n")
     
     # Invoke Strategist (General)
-    strategist_output = invoke_strategist(task, png)
+    strategist_png = encode_image(rgb, AGENT_IMAGE_W, AGENT_IMAGE_H, image_mode_for("strategist"))
+    state.first_call_warmed["strategist"] = "strategist" in state.warm_done
+    start = time.perf_counter()
+    strategist_output = invoke_strategist(task, strategist_png)
+    state.strategist_seconds = time.perf_counter() - start
     print(f"Strategic Doctrine:\n{strategist_output}\n")
     
     # Build Tactician prompt
     tactician_prompt = TACTICIAN_PROMPT_TEMPLATE.format(
         mission=task,
-        doctrine=strategist_output
+        doctrine=doctrine_for("tactician", strategist_output)
     )
     
     print("="*70)
@@ -1145,7 +3782,6 @@ def main() -> None:
     print("="*70 + "\n")
     
     # Initialize state
-    state = AgentState(task, png, (sw, sh))
     state.strategist_doctrine = strategist_output
     state.tactician_prompt = tactician_prompt
     
@@ -1160,8 +3796,15 @@ def main() -> None:
         print(f"Final Phase: {state.current_phase}")
         
         if ENABLE_FULL_ARCHIVE:
-            print(f"Full Archive: {len(state.full_archive)} actions")
+            print(f"Full Archive: {state.history.archived} actions")
         
+        print(f"Argument Parsing: {ARG_REPAIR_STATS}")
+        if ENABLE_TARGET_CACHE:
+            print(f"Target Cache: {len(TARGET_CACHE.entries)} targets, {TARGET_CACHE.hits} lookups, {TARGET_CACHE.snaps} snaps, {TARGET_CACHE.ambiguous} ambiguous")
+        means = {name: sum(v) / len(v) for name, v in state.stage_timings.items() if v}
+        print(f"Mean Stage Timings: {format_stages(means)}")
+        warmed_first = [persona for persona, warmed in state.first_call_warmed.items() if warmed]
+        print(f"First Calls: {format_stages(first_call_seconds(state))} (warmed: {', '.join(warmed_first) or 'none'})")
         print("="*70 + "\n")
         
     except KeyboardInterrupt:
@@ -1178,7 +3821,7 @@ def main() -> None:
                     "strategist_doctrine": state.strategist_doctrine,
                     "tactician_prompt": state.tactician_prompt,
                     "current_executor_prompt": state.current_executor_prompt,
-                    "full_archive": state.full_archive
+                    "full_archive": list(state.history.archive_dicts())
                 }, f, indent=2)
             print(f"Checkpoint saved: {checkpoint}")
         
@@ -0,0 +1,268 @@
+"""Win32 platform layer: screen capture and synthetic input via ctypes.
+
+The DLLs are loaded and prototyped on first use, so importing this module
+(and everything that imports it) works on any OS; only calling into it
+needs Windows.
+"""
+
+import ctypes
+import os
+from ctypes import wintypes
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+for attr in ["HCURSOR", "HICON", "HBITMAP", "HGDIOBJ", "HBRUSH", "HDC"]:
+    if not hasattr(wintypes, attr):
+        setattr(wintypes, attr, wintypes.HANDLE)
+if not hasattr(wintypes, "ULONG_PTR"):
+    wintypes.ULONG_PTR = ctypes.c_size_t
+
+DPI_AWARENESS_CONTEXT_PER_MONITOR_AWARE_V2 = ctypes.c_void_p(-4)
+SM_CXSCREEN, SM_CYSCREEN = 0, 1
+CURSOR_SHOWING, DI_NORMAL = 0x00000001, 0x0003
+BI_RGB, DIB_RGB_COLORS = 0, 0
+HALFTONE, SRCCOPY = 4, 0x00CC0020
+INPUT_MOUSE, INPUT_KEYBOARD = 0, 1
+KEYEVENTF_KEYUP, KEYEVENTF_UNICODE = 0x0002, 0x0004
+MOUSEEVENTF_LEFTDOWN, MOUSEEVENTF_LEFTUP = 0x0002, 0x0004
+MOUSEEVENTF_RIGHTDOWN, MOUSEEVENTF_RIGHTUP = 0x0008, 0x0010
+MOUSEEVENTF_WHEEL = 0x0800
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+
+VK_MAP = {
+    "enter": 0x0D, "tab": 0x09, "escape": 0x1B, "esc": 0x1B, "windows": 0x5B, "win": 0x5B,
+    "ctrl": 0x11, "alt": 0x12, "shift": 0x10, "f4": 0x73, "c": 0x43, "v": 0x56,
+    "t": 0x54, "w": 0x57, "f": 0x46, "l": 0x4C, "r": 0x52,
+    "backspace": 0x08, "delete": 0x2E, "space": 0x20,
+    "home": 0x24, "end": 0x23, "pageup": 0x21, "pagedown": 0x22,
+    "left": 0x25, "up": 0x26, "right": 0x27, "down": 0x28,
+}
+
+class POINT(ctypes.Structure):
+    _fields_ = [("x", wintypes.LONG), ("y", wintypes.LONG)]
+
+class CURSORINFO(ctypes.Structure):
+    _fields_ = [("cbSize", wintypes.DWORD), ("flags", wintypes.DWORD),
+                ("hCursor", wintypes.HCURSOR), ("ptScreenPos", POINT)]
+
+class ICONINFO(ctypes.Structure):
+    _fields_ = [("fIcon", wintypes.BOOL), ("xHotspot", wintypes.DWORD),
+                ("yHotspot", wintypes.DWORD), ("hbmMask", wintypes.HBITMAP),
+                ("hbmColor", wintypes.HBITMAP)]
+
+class BITMAPINFOHEADER(ctypes.Structure):
+    _fields_ = [("biSize", wintypes.DWORD), ("biWidth", wintypes.LONG),
+                ("biHeight", wintypes.LONG), ("biPlanes", wintypes.WORD),
+                ("biBitCount", wintypes.WORD), ("biCompression", wintypes.DWORD),
+                ("biSizeImage", wintypes.DWORD), ("biXPelsPerMeter", wintypes.LONG),
+                ("biYPelsPerMeter", wintypes.LONG), ("biClrUsed", wintypes.DWORD),
+                ("biClrImportant", wintypes.DWORD)]
+
+class BITMAPINFO(ctypes.Structure):
+    _fields_ = [("bmiHeader", BITMAPINFOHEADER), ("bmiColors", wintypes.DWORD * 3)]
+
+class MOUSEINPUT(ctypes.Structure):
+    _fields_ = [("dx", wintypes.LONG), ("dy", wintypes.LONG), ("mouseData", wintypes.DWORD),
+                ("dwFlags", wintypes.DWORD), ("time", wintypes.DWORD),
+                ("dwExtraInfo", wintypes.ULONG_PTR)]
+
+class KEYBDINPUT(ctypes.Structure):
+    _fields_ = [("wVk", wintypes.WORD), ("wScan", wintypes.WORD),
+                ("dwFlags", wintypes.DWORD), ("time", wintypes.DWORD),
+                ("dwExtraInfo", wintypes.ULONG_PTR)]
+
+class HARDWAREINPUT(ctypes.Structure):
+    _fields_ = [("uMsg", wintypes.DWORD), ("wParamL", wintypes.WORD), ("wParamH", wintypes.WORD)]
+
+class INPUT_I(ctypes.Union):
+    _fields_ = [("mi", MOUSEINPUT), ("ki", KEYBDINPUT), ("hi", HARDWAREINPUT)]
+
+class INPUT(ctypes.Structure):
+    _fields_ = [("type", wintypes.DWORD), ("ii", INPUT_I)]
+
+# ============================================================================
+# LAZY BINDING
+# ============================================================================
+
+class LazyDLL:
+    """Stand-in for a WinDLL until bind() replaces it with the real one."""
+    def __init__(self, name: str):
+        self.name = name
+    
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(bind()[self.name], attr)
+
+user32 = LazyDLL("user32")
+gdi32 = LazyDLL("gdi32")
+kernel32 = LazyDLL("kernel32")
+
+@lru_cache(maxsize=1)
+def bind() -> Dict[str, Any]:
+    """Load user32/gdi32/kernel32 and declare prototypes (once)."""
+    global user32, gdi32, kernel32
+    if not hasattr(ctypes, "WinDLL"):
+        raise OSError("the Win32 platform layer requires Windows")
+    user32 = ctypes.WinDLL("user32", use_last_error=True)
+    gdi32 = ctypes.WinDLL("gdi32", use_last_error=True)
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    
+    user32.GetSystemMetrics.argtypes = [wintypes.INT]
+    user32.GetSystemMetrics.restype = wintypes.INT
+    user32.GetCursorInfo.argtypes = [ctypes.POINTER(CURSORINFO)]
+    user32.GetCursorInfo.restype = wintypes.BOOL
+    user32.GetIconInfo.argtypes = [wintypes.HICON, ctypes.POINTER(ICONINFO)]
+    user32.GetIconInfo.restype = wintypes.BOOL
+    user32.DrawIconEx.argtypes = [wintypes.HDC, wintypes.INT, wintypes.INT, wintypes.HICON,
+                                  wintypes.INT, wintypes.INT, wintypes.UINT, wintypes.HBRUSH, wintypes.UINT]
+    user32.DrawIconEx.restype = wintypes.BOOL
+    user32.GetDC.argtypes = [wintypes.HWND]
+    user32.GetDC.restype = wintypes.HDC
+    user32.ReleaseDC.argtypes = [wintypes.HWND, wintypes.HDC]
+    user32.ReleaseDC.restype = wintypes.INT
+    user32.SetCursorPos.argtypes = [wintypes.INT, wintypes.INT]
+    user32.SetCursorPos.restype = wintypes.BOOL
+    user32.SendInput.argtypes = [wintypes.UINT, ctypes.POINTER(INPUT), ctypes.c_int]
+    user32.SendInput.restype = wintypes.UINT
+    user32.SetProcessDpiAwarenessContext.argtypes = [wintypes.HANDLE]
+    user32.SetProcessDpiAwarenessContext.restype = wintypes.BOOL
+    gdi32.CreateCompatibleDC.argtypes = [wintypes.HDC]
+    gdi32.CreateCompatibleDC.restype = wintypes.HDC
+    gdi32.DeleteDC.argtypes = [wintypes.HDC]
+    gdi32.DeleteDC.restype = wintypes.BOOL
+    gdi32.SelectObject.argtypes = [wintypes.HDC, wintypes.HGDIOBJ]
+    gdi32.SelectObject.restype = wintypes.HGDIOBJ
+    gdi32.DeleteObject.argtypes = [wintypes.HGDIOBJ]
+    gdi32.DeleteObject.restype = wintypes.BOOL
+    gdi32.CreateDIBSection.argtypes = [wintypes.HDC, ctypes.POINTER(BITMAPINFO), wintypes.UINT,
+                                        ctypes.POINTER(ctypes.c_void_p), wintypes.HANDLE, wintypes.DWORD]
+    gdi32.CreateDIBSection.restype = wintypes.HBITMAP
+    gdi32.StretchBlt.argtypes = [wintypes.HDC, wintypes.INT, wintypes.INT, wintypes.INT, wintypes.INT,
+                                 wintypes.HDC, wintypes.INT, wintypes.INT, wintypes.INT, wintypes.INT, wintypes.DWORD]
+    gdi32.StretchBlt.restype = wintypes.BOOL
+    gdi32.SetStretchBltMode.argtypes = [wintypes.HDC, wintypes.INT]
+    gdi32.SetStretchBltMode.restype = wintypes.INT
+    gdi32.SetBrushOrgEx.argtypes = [wintypes.HDC, wintypes.INT, wintypes.INT, ctypes.POINTER(POINT)]
+    gdi32.SetBrushOrgEx.restype = wintypes.BOOL
+    user32.GetForegroundWindow.argtypes = []
+    user32.GetForegroundWindow.restype = wintypes.HWND
+    user32.GetWindowThreadProcessId.argtypes = [wintypes.HWND, ctypes.POINTER(wintypes.DWORD)]
+    user32.GetWindowThreadProcessId.restype = wintypes.DWORD
+    kernel32.OpenProcess.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+    kernel32.OpenProcess.restype = wintypes.HANDLE
+    kernel32.QueryFullProcessImageNameW.argtypes = [wintypes.HANDLE, wintypes.DWORD, wintypes.LPWSTR, ctypes.POINTER(wintypes.DWORD)]
+    kernel32.QueryFullProcessImageNameW.restype = wintypes.BOOL
+    kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+    kernel32.CloseHandle.restype = wintypes.BOOL
+    return {"user32": user32, "gdi32": gdi32, "kernel32": kernel32}
+
+# ============================================================================
+# PRIMITIVES
+# ============================================================================
+
+def init_dpi() -> None:
+    user32.SetProcessDpiAwarenessContext(DPI_AWARENESS_CONTEXT_PER_MONITOR_AWARE_V2)
+
+def get_screen_size() -> Tuple[int, int]:
+    w = user32.GetSystemMetrics(SM_CXSCREEN)
+    h = user32.GetSystemMetrics(SM_CYSCREEN)
+    return (w if w > 0 else 1920, h if h > 0 else 1080)
+
+def get_foreground_app() -> str:
+    """Executable name of the foreground window's process (e.g. 'notepad.exe')."""
+    hwnd = user32.GetForegroundWindow()
+    if not hwnd:
+        return "desktop"
+    pid = wintypes.DWORD()
+    user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid.value)
+    if not handle:
+        return "unknown"
+    try:
+        buf = ctypes.create_unicode_buffer(260)
+        size = wintypes.DWORD(len(buf))
+        if not kernel32.QueryFullProcessImageNameW(handle, 0, buf, ctypes.byref(size)):
+            return "unknown"
+        return os.path.basename(buf.value).lower()
+    finally:
+        kernel32.CloseHandle(handle)
+
+def get_cursor_pos() -> Optional[Tuple[int, int]]:
+    """Screen position of the cursor hotspot, or None while the cursor is hidden."""
+    ci = CURSORINFO(cbSize=ctypes.sizeof(CURSORINFO))
+    if not user32.GetCursorInfo(ctypes.byref(ci)) or not (ci.flags & CURSOR_SHOWING):
+        return None
+    return int(ci.ptScreenPos.x), int(ci.ptScreenPos.y)
+
+def draw_cursor(hdc_mem: int, sw: int, sh: int, dw: int, dh: int) -> None:
+    ci = CURSORINFO(cbSize=ctypes.sizeof(CURSORINFO))
+    if not user32.GetCursorInfo(ctypes.byref(ci)) or not (ci.flags & CURSOR_SHOWING):
+        return
+    ii = ICONINFO()
+    if not user32.GetIconInfo(ci.hCursor, ctypes.byref(ii)):
+        return
+    try:
+        cx = int(ci.ptScreenPos.x) - int(ii.xHotspot)
+        cy = int(ci.ptScreenPos.y) - int(ii.yHotspot)
+        dx = int(round(cx * (dw / float(sw))))
+        dy = int(round(cy * (dh / float(sh))))
+        user32.DrawIconEx(hdc_mem, dx, dy, ci.hCursor, 0, 0, 0, None, DI_NORMAL)
+    finally:
+        if ii.hbmMask:
+            gdi32.DeleteObject(ii.hbmMask)
+        if ii.hbmColor:
+            gdi32.DeleteObject(ii.hbmColor)
+
+def capture_frame(tw: int, th: int) -> Tuple[bytes, int, int]:
+    """Capture screen scaled to tw x th as packed RGB bytes."""
+    sw, sh = get_screen_size()
+    hdc_scr = user32.GetDC(None)
+    if not hdc_scr:
+        raise RuntimeError("GetDC failed")
+    hdc_mem = gdi32.CreateCompatibleDC(hdc_scr)
+    if not hdc_mem:
+        user32.ReleaseDC(None, hdc_scr)
+        raise RuntimeError("CreateCompatibleDC failed")
+    
+    bmi = BITMAPINFO()
+    bmi.bmiHeader.biSize = ctypes.sizeof(BITMAPINFOHEADER)
+    bmi.bmiHeader.biWidth, bmi.bmiHeader.biHeight = tw, -th
+    bmi.bmiHeader.biPlanes, bmi.bmiHeader.biBitCount = 1, 32
+    bmi.bmiHeader.biCompression = BI_RGB
+    bits = ctypes.c_void_p()
+    hbm = gdi32.CreateDIBSection(hdc_scr, ctypes.byref(bmi), DIB_RGB_COLORS, ctypes.byref(bits), None, 0)
+    if not hbm or not bits:
+        gdi32.DeleteDC(hdc_mem)
+        user32.ReleaseDC(None, hdc_scr)
+        raise RuntimeError("CreateDIBSection failed")
+    
+    old = gdi32.SelectObject(hdc_mem, hbm)
+    gdi32.SetStretchBltMode(hdc_mem, HALFTONE)
+    gdi32.SetBrushOrgEx(hdc_mem, 0, 0, None)
+    if not gdi32.StretchBlt(hdc_mem, 0, 0, tw, th, hdc_scr, 0, 0, sw, sh, SRCCOPY):
+        gdi32.SelectObject(hdc_mem, old)
+        gdi32.DeleteObject(hbm)
+        gdi32.DeleteDC(hdc_mem)
+        user32.ReleaseDC(None, hdc_scr)
+        raise RuntimeError("StretchBlt failed")
+    
+    draw_cursor(hdc_mem, sw, sh, tw, th)
+    raw = bytes((ctypes.c_ubyte * (tw * th * 4)).from_address(bits.value))
+    gdi32.SelectObject(hdc_mem, old)
+    gdi32.DeleteObject(hbm)
+    gdi32.DeleteDC(hdc_mem)
+    user32.ReleaseDC(None, hdc_scr)
+    
+    # BGRA → RGB via strided slice copies
+    rgb = bytearray(tw * th * 3)
+    rgb[0::3] = raw[2::4]
+    rgb[1::3] = raw[1::4]
+    rgb[2::3] = raw[0::4]
+    return bytes(rgb), sw, sh
+
+def send_input(inputs) -> None:
+    arr = (INPUT * len(inputs))(*inputs)
+    if user32.SendInput(len(inputs), arr, ctypes.sizeof(INPUT)) != len(inputs):
+        raise RuntimeError("SendInput failed")
+
+def move_mouse(x: int, y: int) -> None:
+    user32.SetCursorPos(int(x), int(y))